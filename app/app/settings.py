@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
+from datetime import timedelta
 from pathlib import Path
 import os
 
@@ -21,12 +22,16 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # See https://docs.djangoproject.com/en/3.2/howto/deployment/checklist/
 
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = 'django-insecure-g4g02$gl26uoxofjbrv!iv@ltsxit@7-@6)b+*8wq8*j^blv-9'
+SECRET_KEY = os.environ.get(
+    'SECRET_KEY',
+    'django-insecure-g4g02$gl26uoxofjbrv!iv@ltsxit@7-@6)b+*8wq8*j^blv-9')
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.environ.get('DEBUG', '1') == '1'
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = [
+    host for host in os.environ.get('ALLOWED_HOSTS', '').split(',') if host
+]
 
 
 # Application definition
@@ -46,7 +51,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
+    'core.querycheck.QueryCheckMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -55,6 +63,28 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Responses from this size on are compressed, with brotli when the
+# package is installed and the client accepts it, gzip otherwise.
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+COMPRESSION_BROTLI_QUALITY = int(
+    os.environ.get('COMPRESSION_BROTLI_QUALITY', 4))
+
+# Per route timings in Server-Timing headers and on /metrics
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '0') == '1'
+
+# Reports queries repeated REPEATED times in a request (N+1 patterns),
+# queries slower than SLOW_MS and requests running more than BUDGET
+# queries; the test runner turns the reports into failures.
+QUERY_CHECK = {
+    'ENABLED': os.environ.get('QUERY_CHECK', '0') == '1',
+    'REPEATED': int(os.environ.get('QUERY_CHECK_REPEATED', 5)),
+    'SLOW_MS': float(os.environ.get('QUERY_CHECK_SLOW_MS', 100)),
+    'BUDGET': int(os.environ.get('QUERY_CHECK_BUDGET', 0)) or None,
+    'RAISE': False,
+}
+
+TEST_RUNNER = 'core.test_runner.QueryCheckRunner'
+
 ROOT_URLCONF = 'app.urls'
 
 TEMPLATES = [
@@ -85,10 +115,65 @@ DATABASES = {
         'HOST': os.environ.get('DB_HOST'),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
-        'PASSWORD': os.environ.get('DB_PASS')
+        'PASSWORD': os.environ.get('DB_PASS'),
+        'PORT': os.environ.get('DB_PORT', ''),
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': os.environ.get('DB_CONN_HEALTH_CHECKS', '1') == '1',
+        'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('DB_PGBOUNCER') == '1',
+    }
+}
+
+# Connections are kept open for DB_CONN_MAX_AGE seconds (0 closes them
+# after every request). With CONN_HEALTH_CHECKS a reused connection is
+# pinged when a request starts, see core.health. DB_PGBOUNCER=1 is for
+# PgBouncer in transaction pooling mode, where the server-side cursors
+# of QuerySet.iterator() cannot outlive a transaction.
+
+# DB_ENGINE=sqlite runs on a local SQLite file instead, e.g. for benchmarks
+if os.environ.get('DB_ENGINE') == 'sqlite':
+    DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('DB_NAME') or BASE_DIR / 'db.sqlite3',
+    }
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
     }
 }
 
+# LocMemCache is per process, so it only suits a single process: with
+# several workers a write would only invalidate the cached responses of
+# the worker serving it, and throttles would count per worker. Deploys
+# set CACHE_BACKEND to e.g. ...memcached.PyMemcacheCache and
+# CACHE_LOCATION to its host:port.
+
+API_CACHE_ALIAS = 'default'
+API_CACHE_TIMEOUT = int(os.environ.get('API_CACHE_TIMEOUT', 300))
+
+
+# Token authentication
+
+TOKEN_TTL = timedelta(
+    seconds=int(os.environ.get('TOKEN_TTL', 14 * 24 * 60 * 60)))
+TOKEN_REFRESH_INTERVAL = timedelta(
+    seconds=int(os.environ.get('TOKEN_REFRESH_INTERVAL', 24 * 60 * 60)))
+
+TOKEN_AUTH_CACHE = {
+    'TTL': int(os.environ.get('TOKEN_AUTH_CACHE_TTL', 60)),
+    'MAX_SIZE': int(os.environ.get('TOKEN_AUTH_CACHE_MAX_SIZE', 10000)),
+    'SHARED_CACHE_ALIAS': os.environ.get('TOKEN_AUTH_SHARED_CACHE'),
+}
+
+# Without a shared cache alias each worker keeps accepting a deleted token
+# or a deactivated user from its own LRU for up to TTL seconds.
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -109,6 +194,48 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing
+# https://docs.djangoproject.com/en/3.2/topics/auth/passwords/
+# The hasher picked by PASSWORD_HASHER hashes new passwords; the others
+# still verify existing hashes, which are upgraded on the next login.
+
+PASSWORD_HASHER_STRATEGIES = {
+    'argon2': 'core.hashers.TunedArgon2PasswordHasher',
+    'bcrypt': 'core.hashers.TunedBCryptSHA256PasswordHasher',
+    'pbkdf2': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+}
+PASSWORD_HASHER = os.environ.get('PASSWORD_HASHER', 'argon2')
+PASSWORD_HASHERS = [PASSWORD_HASHER_STRATEGIES[PASSWORD_HASHER]] + [
+    hasher for name, hasher in PASSWORD_HASHER_STRATEGIES.items()
+    if name != PASSWORD_HASHER
+]
+
+ARGON2_TIME_COST = int(os.environ.get('ARGON2_TIME_COST', 2))
+ARGON2_MEMORY_COST = int(os.environ.get('ARGON2_MEMORY_COST', 19456))
+ARGON2_PARALLELISM = int(os.environ.get('ARGON2_PARALLELISM', 1))
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', 10))
+
+
+# Rest framework
+# https://www.django-rest-framework.org/api-guide/settings/
+
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'core.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': os.environ.get('LOGIN_IP_RATE', '60/min'),
+        'login_email': os.environ.get('LOGIN_EMAIL_RATE', '10/min'),
+    },
+}
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/3.2/topics/i18n/
 
@@ -132,6 +259,21 @@ MEDIA_URL  = '/media/'
 STATIC_ROOT = '/vol/web/static'
 MEDIA_ROOT = '/vol/web/media'
 
+# Uploaded recipe images are resized off the request thread by a pool
+# of RECIPE_IMAGE_WORKERS threads; 0 processes them after the commit of
+# the upload, in the request.
+RECIPE_IMAGE_WORKERS = int(os.environ.get('RECIPE_IMAGE_WORKERS', 2))
+RECIPE_IMAGE_QUALITY = int(os.environ.get('RECIPE_IMAGE_QUALITY', 80))
+RECIPE_IMAGE_MAX_BYTES = int(
+    os.environ.get('RECIPE_IMAGE_MAX_BYTES', 10 * 1024 * 1024))
+RECIPE_IMAGE_MAX_PIXELS = int(
+    os.environ.get('RECIPE_IMAGE_MAX_PIXELS', 40_000_000))
+RECIPE_IMAGE_RENDITIONS = {
+    'thumbnail': (160, 160),
+    'medium': (640, 640),
+    'large': (1280, 1280),
+}
+
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
@@ -141,3 +283,19 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'core.User'
 
+
+# Pagination of the list endpoints
+
+API_PAGE_SIZE = int(os.environ.get('API_PAGE_SIZE', 50))
+API_MAX_PAGE_SIZE = int(os.environ.get('API_MAX_PAGE_SIZE', 500))
+API_MAX_BULK_SIZE = int(os.environ.get('API_MAX_BULK_SIZE', 1000))
+
+
+# Under ASGI the recipe API views are coroutines running the sync views
+# on a pool of API_ASYNC_THREADS threads, see recipe.async_views.
+API_ASYNC_VIEWS = os.environ.get('API_ASYNC_VIEWS', '0') == '1'
+API_ASYNC_THREADS = int(os.environ.get('API_ASYNC_THREADS', 8))
+
+# Lists whose serializer only has plain fields and id lists are built
+# from values() rows instead of model instances, see recipe.values.
+API_VALUES_LISTS = os.environ.get('API_VALUES_LISTS', '1') == '1'
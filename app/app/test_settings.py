@@ -0,0 +1,20 @@
+"""
+Settings for fast test runs
+
+    python manage.py test --settings=app.test_settings --parallel
+
+Passwords are hashed with MD5 and the tables are created straight from
+the models in an in-memory SQLite database, without running migrations.
+PostgreSQL specific tests are skipped.
+"""
+from app.settings import *  # noqa: F401,F403
+
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+        'TEST': {'MIGRATE': False},
+    }
+}
@@ -0,0 +1,329 @@
+import io
+import shutil
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import get_hashers
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connection
+from django.db.models import Prefetch
+from django.test.utils import override_settings
+from django.urls import reverse
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APIRequestFactory
+
+SCENARIOS = {}
+
+
+def scenario(func=None, *, atomic=True):
+    """Registers a benchmark scenario under the function name
+
+    Scenarios run in a rolled back transaction, unless atomic is False
+    for those that need to commit and then clean up after themselves.
+    """
+    def register(func):
+        func.atomic = atomic
+        SCENARIOS[func.__name__] = func
+        return func
+    return register(func) if func else register
+
+
+def percentile(values, percent):
+    """Returns the nearest rank percentile of the sorted values"""
+    index = max(0, round(percent / 100 * len(values)) - 1)
+    return values[index]
+
+
+def measure(func, iterations):
+    """Calls func repeatedly and reports throughput, latency and queries"""
+    latencies = []
+    queries = 0
+
+    def count(execute, sql, params, many, context):
+        nonlocal queries
+        queries += 1
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(count):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            call_start = time.perf_counter()
+            func()
+            latencies.append(time.perf_counter() - call_start)
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'iterations': iterations,
+        'per_second': round(iterations / elapsed, 1),
+        'p50_ms': round(statistics.median(latencies) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'queries_per_call': queries / iterations,
+    }
+
+
+def benchmark_user(email='benchmark@example.com'):
+    return get_user_model().objects.create_user(
+        email=email, password='benchmark')
+
+
+@scenario
+def auth(iterations):
+    """Token authentication with and without the lookup cache"""
+    from user.authentication import CachedTokenAuthentication, token_cache
+
+    token = Token.objects.create(user=benchmark_user())
+    request = APIRequestFactory().get(
+        '/', HTTP_AUTHORIZATION=f'Token {token.key}')
+    token_cache.clear()
+
+    results = {}
+    for authentication in (TokenAuthentication(), CachedTokenAuthentication()):
+        name = type(authentication).__name__
+        results[name] = measure(
+            lambda: authentication.authenticate(request), iterations)
+    return results
+
+
+@scenario
+def hashers(iterations):
+    """Password checks per second on one core for each configured hasher
+
+    A login costs one check, so this is the login rate a core sustains.
+    Hashing is slow by design, so a hundredth of the iterations are run.
+    """
+    iterations = max(1, iterations // 100)
+    results = {}
+    for hasher in get_hashers():
+        try:
+            encoded = hasher.encode('benchmark', hasher.salt())
+        except ValueError:
+            continue
+        results[hasher.algorithm] = measure(
+            lambda: hasher.verify('benchmark', encoded), iterations)
+    return results
+
+
+CONNECTION_MODES = {
+    'per_request': {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False},
+    'persistent': {'CONN_MAX_AGE': 60, 'CONN_HEALTH_CHECKS': False},
+    'persistent_checked': {'CONN_MAX_AGE': 60, 'CONN_HEALTH_CHECKS': True},
+}
+
+
+@scenario(atomic=False)
+def recipe_list(iterations):
+    """Recipe list requests per second with each connection mode
+
+    Requests go through the WSGI handler, so connections are opened and
+    closed as they are in production, and the response cache is off.
+    """
+    from core.models import Recipe
+    from user.authentication import token_for
+
+    settings_dict = connection.settings_dict
+    original = {name: settings_dict.get(name) for name in
+                ('CONN_MAX_AGE', 'CONN_HEALTH_CHECKS')}
+    user = benchmark_user()
+    try:
+        Recipe.objects.bulk_create(
+            Recipe(user=user, title=f'Recipe {i}', time_minutes=10,
+                   price=Decimal('5.00'))
+            for i in range(50)
+        )
+        factory = APIRequestFactory()
+        url = reverse('recipe:recipe-list')
+        authorization = f'Token {token_for(user).key}'
+        handler = WSGIHandler()
+
+        def start_response(status, headers):
+            if not status.startswith('200'):
+                raise RuntimeError(f'{url} answered {status}')
+
+        def call():
+            request = factory.get(url, HTTP_AUTHORIZATION=authorization)
+            handler(request.environ, start_response).close()
+
+        results = {}
+        with override_settings(
+                ALLOWED_HOSTS=['testserver'],
+                API_CACHE_ALIAS='benchmark',
+                CACHES={**settings.CACHES, 'benchmark': {
+                    'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+                }}):
+            for mode, options in CONNECTION_MODES.items():
+                connection.close()
+                settings_dict.update(options)
+                results[mode] = measure(call, iterations)
+        return results
+    finally:
+        settings_dict.update(original)
+        user.delete()
+
+
+@scenario
+def serialization(iterations):
+    """Rendering a page of recipes through the serializer or values() rows
+
+    Both paths must produce the same bytes, which is reported as well.
+    """
+    from core.models import Ingredient, Recipe, Tag
+    from core.renderers import FastJSONRenderer
+    from rest_framework.renderers import JSONRenderer
+    from recipe.serializers import RecipeSerializer
+    from recipe.values import ValuesPlan
+
+    user = benchmark_user()
+    Tag.objects.bulk_create(
+        Tag(user=user, name=f'Tag {i}') for i in range(10))
+    Ingredient.objects.bulk_create(
+        Ingredient(user=user, name=f'Ingredient {i}') for i in range(20))
+    for i in range(settings.API_PAGE_SIZE):
+        recipe = Recipe.objects.create(
+            user=user, title=f'Recipe {i}', time_minutes=i,
+            price=Decimal('5.25'))
+        recipe.tags.add(*Tag.objects.filter(user=user)[:i % 5])
+        recipe.ingredients.add(*Ingredient.objects.filter(user=user)[:i % 8])
+
+    recipes = Recipe.objects.filter(user=user).order_by('id')
+    plan = ValuesPlan.build(RecipeSerializer())
+
+    def serializer_page():
+        page = recipes.prefetch_related(
+            Prefetch('tags', queryset=Tag.objects.only('id').order_by('id')),
+            Prefetch('ingredients',
+                     queryset=Ingredient.objects.only('id').order_by('id')))
+        return JSONRenderer().render(RecipeSerializer(page, many=True).data)
+
+    def values_page():
+        return FastJSONRenderer().render(
+            plan.represent(list(plan.values(recipes))))
+
+    iterations = max(1, iterations // 10)
+    return {
+        'recipes': len(recipes),
+        'identical': serializer_page() == values_page(),
+        'serializer': measure(serializer_page, iterations),
+        'values': measure(values_page, iterations),
+    }
+
+
+@contextmanager
+def api_client(**seed_options):
+    """Yields a freshly seeded user and an API client authenticated as it
+
+    Throttles and the response cache are off, so every request does the
+    full work, and uploads are written to a temporary MEDIA_ROOT.
+    """
+    from core.seed import seed
+
+    media_root = tempfile.mkdtemp()
+    try:
+        with override_settings(
+                ALLOWED_HOSTS=['testserver'],
+                MEDIA_ROOT=media_root,
+                CACHES={**settings.CACHES, 'default': {
+                    'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+                }}):
+            user, = seed(prefix='benchmark', **seed_options)
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f'Token {user.auth_token}')
+            yield user, client
+    finally:
+        shutil.rmtree(media_root, ignore_errors=True)
+
+
+def request(method, url, expected, **kwargs):
+    """Returns a function making the request and checking its status"""
+    def call():
+        res = method(url, **kwargs)
+        if res.status_code != expected:
+            raise RuntimeError(f'{url} answered {res.status_code}')
+    return call
+
+
+@scenario
+def login(iterations):
+    """Token requests with the email and password of a user
+
+    Dominated by the password hasher, so a hundredth of the iterations
+    are run.
+    """
+    from core.seed import SEED_PASSWORD
+
+    with api_client(recipes=0) as (user, client):
+        client.credentials()
+        call = request(client.post, reverse('user:token'), 200, data={
+            'email': user.email, 'password': SEED_PASSWORD})
+        return measure(call, max(1, iterations // 100))
+
+
+@scenario
+def list_recipes(iterations):
+    """Pages of the recipe list of a user with 500 recipes"""
+    with api_client(recipes=500) as (user, client):
+        return measure(request(
+            client.get, reverse('recipe:recipe-list'), 200), iterations)
+
+
+@scenario
+def retrieve_recipe(iterations):
+    """Recipe details with their tags and ingredients"""
+    from core.models import Recipe
+
+    with api_client(recipes=10) as (user, client):
+        recipe = Recipe.objects.filter(user=user).first()
+        url = reverse('recipe:recipe-detail', args=[recipe.id])
+        return measure(request(client.get, url, 200), iterations)
+
+
+@scenario
+def create_recipe(iterations):
+    """Recipes created with three tags and three ingredients each"""
+    from core.models import Ingredient, Tag
+
+    with api_client(recipes=0) as (user, client):
+        tags = Tag.objects.filter(user=user)
+        ingredients = Ingredient.objects.filter(user=user)
+        payload = {
+            'title': 'Benchmark recipe', 'time_minutes': 10, 'price': '5.00',
+            'tags': [tag.id for tag in tags[:3]],
+            'ingredients': [ingredient.id for ingredient in ingredients[:3]],
+        }
+        return measure(request(
+            client.post, reverse('recipe:recipe-list'), 201,
+            data=payload, format='json'), iterations)
+
+
+@scenario
+def upload_image(iterations):
+    """Uploads of a 1200x800 JPEG, answered before the renditions are made
+
+    The renditions are made once the upload commits, which never happens
+    in the rolled back transaction, so only the request is measured.
+    """
+    from core.models import Recipe
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new('RGB', (1200, 800), color='red').save(buffer, format='JPEG')
+    content = buffer.getvalue()
+
+    with api_client(recipes=1) as (user, client):
+        recipe = Recipe.objects.get(user=user)
+        url = reverse('recipe:recipe-upload-image', args=[recipe.id])
+
+        def call():
+            image = io.BytesIO(content)
+            image.name = 'benchmark.jpg'
+            res = client.post(url, {'image': image}, format='multipart')
+            if res.status_code != 202:
+                raise RuntimeError(f'{url} answered {res.status_code}')
+
+        return measure(call, max(1, iterations // 10))
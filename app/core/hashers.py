@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher, BCryptSHA256PasswordHasher)
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    """Argon2 with the costs taken from the ARGON2_* settings"""
+
+    @property
+    def time_cost(self):
+        return settings.ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.ARGON2_PARALLELISM
+
+
+class TunedBCryptSHA256PasswordHasher(BCryptSHA256PasswordHasher):
+    """bcrypt with the rounds taken from the BCRYPT_ROUNDS setting"""
+
+    @property
+    def rounds(self):
+        return settings.BCRYPT_ROUNDS
+
@@ -0,0 +1,43 @@
+from django.core.signals import request_started
+from django.db import DatabaseError, connections
+from django.dispatch import receiver
+
+
+def check_database(alias='default'):
+    """Open (or reuse) the connection for alias and run a trivial query"""
+    with connections[alias].cursor() as cursor:
+        cursor.execute('SELECT 1')
+        cursor.fetchone()
+
+
+def database_errors():
+    """Return {alias: error} for every configured database that is down"""
+    errors = {}
+    for alias in connections:
+        try:
+            check_database(alias)
+        except DatabaseError as exc:
+            errors[alias] = str(exc)
+    return errors
+
+
+def warm_up():
+    """Connect every database up front so the first request is not slowed"""
+    return database_errors()
+
+
+@receiver(request_started)
+def check_persistent_connections(**kwargs):
+    """Close reused connections the server dropped since the last request
+
+    Django 3.2 only notices a dead persistent connection after a query
+    fails on it, so with CONN_HEALTH_CHECKS it is pinged up front and
+    reopened on first use.
+    """
+    for connection in connections.all():
+        if (connection.connection is None
+                or connection.in_atomic_block
+                or not connection.settings_dict.get('CONN_HEALTH_CHECKS')):
+            continue
+        if not connection.is_usable():
+            connection.close()
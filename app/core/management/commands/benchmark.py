@@ -0,0 +1,88 @@
+import json
+import platform
+import subprocess
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from core.benchmarks import SCENARIOS
+
+
+class Rollback(Exception):
+    """Raised to discard the data created by a benchmark"""
+
+
+def git_commit():
+    """Returns the commit checked out, or None outside of a git checkout"""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+            text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline, results, path=()):
+    """Yields the change of every throughput and latency against a baseline"""
+    for name, value in results.items():
+        before = baseline.get(name)
+        if isinstance(value, dict) and isinstance(before, dict):
+            yield from compare(before, value, path + (name,))
+        elif (name == 'per_second' or name.endswith('_ms')) and before:
+            change = (value - before) / before * 100
+            yield '.'.join(path + (name,)), before, value, change
+
+
+class Command(BaseCommand):
+    """Django command to run the performance benchmarks"""
+    help = 'Runs benchmark scenarios inside a rolled back transaction'
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenarios', nargs='*', choices=sorted(SCENARIOS),
+                            help='Scenarios to run, all of them by default')
+        parser.add_argument('--iterations', type=int, default=1000)
+        parser.add_argument('--output',
+                            help='File to write the results to as JSON')
+        parser.add_argument('--compare', metavar='FILE',
+                            help='Results of an earlier run to compare with')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as f:
+                    baseline = json.load(f)['results']
+            except (OSError, ValueError, KeyError) as e:
+                raise CommandError(f'Cannot read {options["compare"]}: {e}')
+
+        results = {}
+        for name in options['scenarios'] or sorted(SCENARIOS):
+            run = SCENARIOS[name]
+            if not run.atomic:
+                results[name] = run(options['iterations'])
+                continue
+            try:
+                with transaction.atomic():
+                    results[name] = run(options['iterations'])
+                    raise Rollback
+            except Rollback:
+                pass
+
+        report = {
+            'commit': git_commit(),
+            'date': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'iterations': options['iterations'],
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+        self.stdout.write(json.dumps(results, indent=2))
+
+        if baseline is not None:
+            for metric, before, after, change in compare(baseline, results):
+                self.stdout.write(
+                    f'{metric}: {before} -> {after} ({change:+.1f}%)')
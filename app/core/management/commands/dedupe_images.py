@@ -0,0 +1,62 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from core.models import Recipe, detect_image_format, image_content_path
+from core.storage import content_storage, file_digest
+from recipe.images import lock_image, process_image, rendition_path
+
+
+class Command(BaseCommand):
+    """Django command to move recipe images to their content address"""
+    help = 'Renames recipe images after their sha256 and drops duplicates'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report the savings without changing files')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        names = (Recipe.objects.exclude(image='').exclude(image=None)
+                 .order_by().values_list('image', flat=True).distinct())
+        moved = duplicates = freed = 0
+
+        for name in list(names):
+            if not content_storage.exists(name):
+                self.stdout.write(self.style.WARNING(f'Missing file {name}'))
+                continue
+            with content_storage.open(name) as file:
+                target = image_content_path(
+                    file_digest(file), name, detect_image_format(file))
+            if target == name:
+                continue
+
+            if content_storage.exists(target):
+                duplicates += 1
+                freed += content_storage.size(name)
+            else:
+                moved += 1
+            if not dry_run:
+                self.move(name, target)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{moved} images renamed, {duplicates} duplicates removed, '
+            f'{freed} bytes freed'))
+
+    def move(self, name, target):
+        """Points the recipes at the target and renders its renditions"""
+        with transaction.atomic():
+            lock_image(target)
+            recipe_ids = list(Recipe.objects.filter(image=name).values_list(
+                'pk', flat=True))
+            Recipe.objects.filter(pk__in=recipe_ids).update(
+                image=target, image_status=Recipe.IMAGE_PENDING,
+                image_renditions={})
+            content_storage.move_into_place(name, target)
+
+        for size_name in settings.RECIPE_IMAGE_RENDITIONS:
+            for fmt in ('WEBP', 'JPEG'):
+                path = rendition_path(name, size_name, fmt)
+                if path != rendition_path(target, size_name, fmt):
+                    content_storage.delete(path)
+        for recipe_id in recipe_ids:
+            process_image(recipe_id, target)
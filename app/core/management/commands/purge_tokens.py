@@ -0,0 +1,31 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+
+class Command(BaseCommand):
+    """Django command to delete expired authentication tokens"""
+    help = 'Deletes expired tokens in small batches to keep locks short'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--sleep', type=float, default=0.1,
+                            help='Seconds to pause between batches')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - settings.TOKEN_TTL
+        expired = Token.objects.filter(created__lte=cutoff).order_by(
+            'created')
+        batch_size = options['batch_size']
+        purged = 0
+        while True:
+            keys = list(expired.values_list('key', flat=True)[:batch_size + 1])
+            Token.objects.filter(key__in=keys[:batch_size]).delete()
+            purged += len(keys[:batch_size])
+            if len(keys) <= batch_size:
+                break
+            time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f'{purged} tokens purged'))
@@ -0,0 +1,45 @@
+import random
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from core.seed import SEED_PASSWORD, seed
+
+
+class Command(BaseCommand):
+    """Django command to fill the database with generated data"""
+    help = 'Creates users with recipes, tags and ingredients in bulk'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--recipes', type=int, default=100,
+                            help='Recipes per user')
+        parser.add_argument('--tags', type=int, default=20,
+                            help='Tags per user')
+        parser.add_argument('--ingredients', type=int, default=50,
+                            help='Ingredients per user')
+        parser.add_argument('--links', type=int, default=3,
+                            help='Most tags and ingredients per recipe')
+        parser.add_argument('--prefix', default='seed',
+                            help='Prefix of the generated emails')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Random seed, for reproducible data')
+        parser.add_argument('--clear', action='store_true',
+                            help='Delete the users of the prefix first')
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        with transaction.atomic():
+            if options['clear']:
+                get_user_model().objects.filter(
+                    email__startswith=f'{prefix}-').delete()
+            users = seed(
+                users=options['users'], recipes=options['recipes'],
+                tags=options['tags'], ingredients=options['ingredients'],
+                links=options['links'], prefix=prefix,
+                rng=random.Random(options['seed']))
+
+        if users:
+            self.stdout.write(self.style.SUCCESS(
+                f'Created {len(users)} users with {options["recipes"]} '
+                f'recipes each, first {users[0].email} with password '
+                f'{SEED_PASSWORD} and token {users[0].auth_token}'))
@@ -1,24 +1,34 @@
 import time
-from typing import ByteString 
 from django.db import connections
 from django.db.utils import OperationalError
-from django.core.management.base import BaseCommand
-
+from django.core.management.base import BaseCommand, CommandError
 
 
 class Command(BaseCommand):
-    """Django command to pause execution"""
+    """Django command to pause execution until the database accepts connections"""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--timeout', type=float, default=60,
+                            help='Seconds to wait before giving up')
+        parser.add_argument('--max-delay', type=float, default=5,
+                            help='Longest pause between two attempts')
+
     def handle(self, *args, **options):
         self.stdout.write('Waiting for database ...')
-        db_con = None
-        while not db_con :
+        deadline = time.monotonic() + options['timeout']
+        delay = 0.1
+        while True:
             try:
-                db_con = connections['default']
+                connections[options['database']].ensure_connection()
+                break
             except OperationalError:
-                self.stdout.write('Database Unavailable, waiting 1 second...')
-                time.sleep(1)
-        
-        self.stdout.write(self.style.SUCCESS('Database available !'))
-
+                if time.monotonic() + delay > deadline:
+                    raise CommandError(
+                        f'Database unavailable after {options["timeout"]} seconds')
+                self.stdout.write(
+                    f'Database Unavailable, waiting {delay:.1f} seconds...')
+                time.sleep(delay)
+                delay = min(delay * 2, options['max_delay'])
 
-        
\ No newline at end of file
+        self.stdout.write(self.style.SUCCESS('Database available !'))
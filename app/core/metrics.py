@@ -0,0 +1,226 @@
+import bisect
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.utils.deprecation import MiddlewareMixin
+from rest_framework import serializers
+
+current = ContextVar('request_metrics', default=None)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class RequestMetrics:
+    """Times and counters of the request being served"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.timings = defaultdict(float)
+        self.queries = 0
+
+    def add(self, name, seconds):
+        self.timings[name] += seconds
+
+
+@contextmanager
+def timer(name):
+    """Adds the time spent in the block to the current request, if any"""
+    metrics = current.get()
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add(name, time.perf_counter() - start)
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper counting the queries and time of the request"""
+    metrics = current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.add('db', time.perf_counter() - start)
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    """Installs record_query on every connection, in every thread
+
+    Requests served by the async views query from pool threads, so a
+    wrapper installed by the middleware on its own thread would miss them.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class Registry:
+    """Prometheus counters and latency histograms of this process
+
+    Every worker keeps its own, so scrape the workers one by one or sum
+    the series by instance.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self.requests = defaultdict(int)
+        self.durations = defaultdict(
+            lambda: [0] * (len(DURATION_BUCKETS) + 1))
+        self.sums = defaultdict(float)
+        self.cache_results = defaultdict(int)
+
+    def count_cache(self, route, result):
+        """Counts a lookup of the response cache: hit, miss or not_modified"""
+        with self.lock:
+            self.cache_results[route, result] += 1
+
+    def observe(self, route, method, status, metrics, wall, size):
+        bucket = bisect.bisect_left(DURATION_BUCKETS, wall)
+        with self.lock:
+            self.requests[route, method, status] += 1
+            self.durations[route][bucket] += 1
+            self.sums[route, 'request_duration_seconds'] += wall
+            self.sums[route, 'db_duration_seconds'] += metrics.timings['db']
+            self.sums[route, 'db_queries'] += metrics.queries
+            self.sums[route, 'serialize_duration_seconds'] += \
+                metrics.timings['serialize']
+            self.sums[route, 'render_duration_seconds'] += \
+                metrics.timings['render']
+            self.sums[route, 'response_bytes'] += size
+
+    def export(self):
+        """Returns the metrics in the Prometheus text format"""
+        with self.lock:
+            requests = dict(self.requests)
+            durations = {route: list(counts)
+                         for route, counts in self.durations.items()}
+            sums = dict(self.sums)
+            cache_results = dict(self.cache_results)
+
+        lines = [
+            '# HELP api_requests_total Requests served',
+            '# TYPE api_requests_total counter',
+        ]
+        for (route, method, status), count in sorted(requests.items()):
+            lines.append(f'api_requests_total{{route="{route}",'
+                         f'method="{method}",status="{status}"}} {count}')
+
+        lines += [
+            '# HELP api_request_duration_seconds Wall time of the requests',
+            '# TYPE api_request_duration_seconds histogram',
+        ]
+        for route, counts in sorted(durations.items()):
+            total = 0
+            for bound, count in zip(DURATION_BUCKETS + ('+Inf',), counts):
+                total += count
+                lines.append(f'api_request_duration_seconds_bucket{{'
+                             f'route="{route}",le="{bound}"}} {total}')
+            lines.append(f'api_request_duration_seconds_sum{{'
+                         f'route="{route}"}} '
+                         f'{sums[route, "request_duration_seconds"]}')
+            lines.append(f'api_request_duration_seconds_count{{'
+                         f'route="{route}"}} {total}')
+
+        for name, help_text in (
+                ('db_duration_seconds', 'Time spent in database queries'),
+                ('db_queries', 'Database queries run'),
+                ('serialize_duration_seconds', 'Time spent serializing'),
+                ('render_duration_seconds', 'Time spent rendering'),
+                ('response_bytes', 'Bytes of the response bodies')):
+            lines += [f'# HELP api_{name}_total {help_text}',
+                      f'# TYPE api_{name}_total counter']
+            for route in sorted(durations):
+                lines.append(f'api_{name}_total{{route="{route}"}} '
+                             f'{sums[route, name]}')
+
+        lines += [
+            '# HELP api_cache_lookups_total Lookups of the response cache',
+            '# TYPE api_cache_lookups_total counter',
+        ]
+        for (route, result), count in sorted(cache_results.items()):
+            lines.append(f'api_cache_lookups_total{{route="{route}",'
+                         f'result="{result}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def route_of(request):
+    """Returns the URL name of the request, like recipe:recipe-list"""
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None else 'unmatched'
+
+
+class MetricsMiddleware(MiddlewareMixin):
+    """Records the wall, database, serialization and render time per route
+
+    The times are sent back in a Server-Timing header and accumulated for
+    the /metrics endpoint. Unless METRICS_ENABLED is set the middleware
+    removes itself, leaving only a context lookup per query.
+    """
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def process_request(self, request):
+        request._metrics = RequestMetrics()
+        current.set(request._metrics)
+
+    def process_response(self, request, response):
+        metrics = getattr(request, '_metrics', None)
+        if metrics is None:
+            return response
+        current.set(None)
+        wall = time.perf_counter() - metrics.start
+
+        size = 0 if response.streaming else len(response.content)
+        registry.observe(route_of(request), request.method,
+                         response.status_code, metrics, wall, size)
+        response['Server-Timing'] = ', '.join([
+            f'app;dur={wall * 1000:.1f}',
+            f'db;dur={metrics.timings["db"] * 1000:.1f};'
+            f'desc="{metrics.queries} queries"',
+            f'serialize;dur={metrics.timings["serialize"] * 1000:.1f}',
+            f'render;dur={metrics.timings["render"] * 1000:.1f}',
+        ])
+        return response
+
+
+class TimedListSerializer(serializers.ListSerializer):
+    """List serializer adding the time spent in .data to the request"""
+
+    @property
+    def data(self):
+        with timer('serialize'):
+            return super().data
+
+
+class TimedSerializerMixin:
+    """Adds the time spent in .data of a serializer to the request
+
+    List serializers are timed by setting the Meta.list_serializer_class
+    of the serializer to TimedListSerializer.
+    """
+
+    @property
+    def data(self):
+        with timer('serialize'):
+            return super().data
@@ -0,0 +1,51 @@
+import re
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_string
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+re_accepts_gzip = re.compile(r'\bgzip\b')
+re_accepts_brotli = re.compile(r'\bbr\b')
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """Compresses responses of COMPRESSION_MIN_SIZE bytes or more
+
+    Brotli is used when the brotli package is installed and the client
+    accepts it, gzip otherwise. As with GZipMiddleware the ETag becomes
+    weak, since the bytes depend on the encoding, and streaming
+    responses such as files are left alone.
+    """
+
+    def process_response(self, request, response):
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        if len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        if brotli is not None and re_accepts_brotli.search(accept_encoding):
+            encoding = 'br'
+            content = brotli.compress(
+                response.content, quality=settings.COMPRESSION_BROTLI_QUALITY)
+        elif re_accepts_gzip.search(accept_encoding):
+            encoding = 'gzip'
+            content = compress_string(response.content)
+        else:
+            return response
+
+        if len(content) >= len(response.content):
+            return response
+        response.content = content
+        response['Content-Length'] = str(len(content))
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
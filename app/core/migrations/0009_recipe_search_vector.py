@@ -0,0 +1,48 @@
+# Generated by Django 3.2.6 on 2026-10-18 18:05
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    """Creates the GIN index and fills the vectors on PostgreSQL only"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'CREATE INDEX core_recipe_search_vector_gin '
+        'ON core_recipe USING gin (search_vector);'
+    )
+    schema_editor.execute(
+        "UPDATE core_recipe SET search_vector = "
+        "setweight(to_tsvector('english', title), 'A') || "
+        "setweight(to_tsvector('english', coalesce(("
+        "SELECT string_agg(t.name, ' ') FROM core_tag t "
+        "JOIN core_recipe_tags rt ON rt.tag_id = t.id "
+        "WHERE rt.recipe_id = core_recipe.id), '')), 'B') || "
+        "setweight(to_tsvector('english', coalesce(("
+        "SELECT string_agg(i.name, ' ') FROM core_ingredient i "
+        "JOIN core_recipe_ingredients ri ON ri.ingredient_id = i.id "
+        "WHERE ri.recipe_id = core_recipe.id), '')), 'B');"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX core_recipe_search_vector_gin;')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_recipe_relation_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
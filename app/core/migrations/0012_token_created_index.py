@@ -0,0 +1,18 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """Index on the token creation time for purging expired tokens"""
+
+    dependencies = [
+        ('core', '0011_recipe_image_content_storage'),
+        ('authtoken', '0003_tokenproxy'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX authtoken_token_created_idx '
+            'ON authtoken_token (created);',
+            'DROP INDEX authtoken_token_created_idx;',
+        ),
+    ]
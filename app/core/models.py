@@ -1,15 +1,44 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.conf import settings
+from core.storage import content_storage, file_digest
 import os
-import uuid
+from PIL import Image
+
+
+IMAGE_EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp', 'GIF': 'gif'}
+EXTENSION_ALIASES = {'jpeg': 'jpg', 'jpe': 'jpg', 'jfif': 'jpg'}
+
+
+def detect_image_format(file):
+    """Returns the format Pillow reads from the header of a file, or None"""
+    try:
+        with Image.open(file) as image:
+            return image.format
+    except Exception:
+        return None
+    finally:
+        file.seek(0)
+
+
+def image_content_path(digest, filename, image_format=None):
+    """Generate file path of an image from the digest of its content
+
+    The extension follows the detected format, or the file name with its
+    aliases folded, so equal content is always stored under one name.
+    """
+    ext = IMAGE_EXTENSIONS.get(image_format)
+    if ext is None:
+        ext = filename.split('.')[-1].lower()
+        ext = EXTENSION_ALIASES.get(ext, ext)
+    return os.path.join('uploads/recipe/', f'{digest}.{ext}')
 
 
 def recipe_image_file_path(instance, filename):
-    """Generate file path"""
-    ext = filename.split('.')[-1]
-    filename = f'{uuid.uuid4()}.{ext}'
-    return os.path.join('uploads/recipe/', filename)
+    """Generate file path from the content of the recipe image"""
+    return image_content_path(file_digest(instance.image), filename,
+                              detect_image_format(instance.image))
 
 
 class UserManager(BaseUserManager):
@@ -48,6 +77,9 @@ class Tag(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL,
                              on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [models.Index(fields=['user', 'name'])]
+
     def __str__(self):
         return self.name
 
@@ -58,12 +90,24 @@ class Ingredient(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL,
                              on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [models.Index(fields=['user', 'name'])]
+
     def __str__(self):
         return self.name
 
 
 class Recipe(models.Model):
     """Recipe object"""
+    IMAGE_PENDING = 'pending'
+    IMAGE_READY = 'ready'
+    IMAGE_FAILED = 'failed'
+    IMAGE_STATUSES = [
+        (IMAGE_PENDING, 'Pending'),
+        (IMAGE_READY, 'Ready'),
+        (IMAGE_FAILED, 'Failed'),
+    ]
+
     user = models.ForeignKey(settings.AUTH_USER_MODEL,
                              on_delete=models.CASCADE)
     title = models.CharField(max_length=255)
@@ -72,7 +116,27 @@ class Recipe(models.Model):
     link = models.CharField(max_length=255, blank=True)
     ingredients = models.ManyToManyField('Ingredient')
     tags = models.ManyToManyField('Tag')
-    image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    image = models.ImageField(null=True, db_index=True,
+                              upload_to=recipe_image_file_path,
+                              storage=content_storage)
+    image_status = models.CharField(max_length=10, blank=True,
+                                    choices=IMAGE_STATUSES)
+    image_renditions = models.JSONField(default=dict, blank=True)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'id']),
+            models.Index(fields=['user', 'title']),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remembers the loaded image to release it once replaced"""
+        instance = super().from_db(db, field_names, values)
+        if 'image' in field_names:
+            instance._loaded_image = values[field_names.index('image')]
+        return instance
 
     def __str__(self):
         return self.title
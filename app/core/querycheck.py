@@ -0,0 +1,140 @@
+import logging
+import re
+import sys
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.utils.deprecation import MiddlewareMixin
+from rest_framework.serializers import Serializer
+
+logger = logging.getLogger(__name__)
+
+current = ContextVar('query_log', default=None)
+
+re_strings = re.compile(r"'(?:[^']|'')*'")
+re_numbers = re.compile(r'\b\d+(?:\.\d+)?\b')
+re_in_lists = re.compile(r'IN \(\?(?:, \?)*\)')
+
+
+class QueryCheckFailed(Exception):
+    """Raised when a request repeats queries or exceeds its query budget"""
+
+
+def query_shape(sql):
+    """Returns the SQL with its literals and IN lists collapsed"""
+    sql = re_strings.sub('?', sql.replace('%s', '?'))
+    sql = re_numbers.sub('?', sql)
+    return re_in_lists.sub('IN (...)', sql)
+
+
+def query_origin():
+    """Returns the serializer field or project code running the query"""
+    frame = sys._getframe(2)
+    base_dir = str(settings.BASE_DIR)
+    location = None
+    while frame is not None:
+        code = frame.f_code
+        if code.co_name == 'to_representation':
+            serializer = frame.f_locals.get('self')
+            field = frame.f_locals.get('field')
+            if isinstance(serializer, Serializer) and field is not None:
+                return f'{type(serializer).__name__}.{field.field_name}'
+        if (location is None and code.co_name != 'record_query'
+                and code.co_filename.startswith(base_dir)
+                and code.co_filename != __file__):
+            path = code.co_filename[len(base_dir) + 1:]
+            location = f'{path}:{frame.f_lineno} in {code.co_name}'
+        frame = frame.f_back
+    return location or 'unknown'
+
+
+class QueryLog:
+    """The queries run while serving one request"""
+
+    def __init__(self):
+        self.queries = []
+
+    def add(self, sql, duration):
+        self.queries.append((query_shape(sql), duration, query_origin()))
+
+    def problems(self, config):
+        """Returns the descriptions of the repeated, slow and extra queries"""
+        problems = []
+        groups = defaultdict(list)
+        for shape, duration, origin in self.queries:
+            groups[shape].append(origin)
+        for shape, origins in groups.items():
+            if len(origins) >= config['REPEATED']:
+                problems.append(
+                    f'{len(origins)} queries with the same shape from '
+                    f'{", ".join(sorted(set(origins)))}: {shape}')
+
+        for shape, duration, origin in self.queries:
+            if duration * 1000 >= config['SLOW_MS']:
+                problems.append(f'slow query ({duration * 1000:.0f} ms) '
+                                f'from {origin}: {shape}')
+
+        budget = config['BUDGET']
+        if budget is not None and len(self.queries) > budget:
+            problems.append(f'{len(self.queries)} queries, over the budget '
+                            f'of {budget}')
+        return problems
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper adding the query to the log of the request, if any"""
+    log = current.get()
+    if log is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        log.add(sql, time.perf_counter() - start)
+
+
+@receiver(connection_created)
+def check_connection(sender, connection, **kwargs):
+    """Installs record_query on every connection, in every thread"""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class QueryCheckMiddleware(MiddlewareMixin):
+    """Reports N+1 patterns, slow queries and requests over budget
+
+    Queries of the same shape run QUERY_CHECK['REPEATED'] times in one
+    request are reported with the serializer field or code running them.
+    Problems are logged, or raised as QueryCheckFailed with RAISE, which
+    the test runner sets.
+    """
+
+    def __init__(self, get_response):
+        if not settings.QUERY_CHECK['ENABLED']:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def process_request(self, request):
+        request._query_log = QueryLog()
+        current.set(request._query_log)
+
+    def process_response(self, request, response):
+        log = getattr(request, '_query_log', None)
+        if log is None:
+            return response
+        current.set(None)
+
+        config = settings.QUERY_CHECK
+        problems = log.problems(config)
+        if not problems:
+            return response
+        message = '{} {}: {}'.format(
+            request.method, request.path, '; '.join(problems))
+        if config['RAISE']:
+            raise QueryCheckFailed(message)
+        logger.warning(message)
+        return response
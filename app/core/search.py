@@ -0,0 +1,62 @@
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, SearchVector)
+from django.db import connection
+from django.db.models import F, FloatField, OuterRef, Q, Subquery
+from django.db.models.functions import Cast
+from core.models import Recipe, Tag, Ingredient
+
+SEARCH_CONFIG = 'english'
+
+
+def search_supported():
+    """Returns if the database can serve the full text search"""
+    return connection.vendor == 'postgresql'
+
+
+def related_names(model):
+    """Sub-query joining the names of the tags or ingredients of a recipe"""
+    return Subquery(
+        model.objects.filter(recipe=OuterRef('pk'))
+        .values('recipe')
+        .annotate(names=StringAgg('name', ' '))
+        .values('names')
+    )
+
+
+def update_search_vectors(recipes):
+    """Rebuilds the search vector of the recipes in a single UPDATE"""
+    if not search_supported():
+        return
+    recipes.update(search_vector=(
+        SearchVector('title', weight='A', config=SEARCH_CONFIG) +
+        SearchVector(related_names(Tag),
+                     weight='B', config=SEARCH_CONFIG) +
+        SearchVector(related_names(Ingredient),
+                     weight='B', config=SEARCH_CONFIG)
+    ))
+
+
+def search_recipes(queryset, text):
+    """Filters recipes matching the text and ranks them on PostgreSQL
+
+    Other databases fall back to unranked substring matches on the
+    title and the tag and ingredient names. The rank is cast to double
+    precision so that the cursor, which filters on the rank of the last
+    result of a page, compares it exactly.
+    """
+    if search_supported():
+        query = SearchQuery(text, search_type='websearch',
+                            config=SEARCH_CONFIG)
+        return queryset.filter(search_vector=query).annotate(
+            rank=Cast(SearchRank(F('search_vector'), query), FloatField()))
+
+    through_tags = Recipe.tags.through.objects.filter(
+        tag__name__icontains=text)
+    through_ingredients = Recipe.ingredients.through.objects.filter(
+        ingredient__name__icontains=text)
+    return queryset.filter(
+        Q(title__icontains=text) |
+        Q(id__in=through_tags.values('recipe')) |
+        Q(id__in=through_ingredients.values('recipe'))
+    )
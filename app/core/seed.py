@@ -0,0 +1,72 @@
+import random
+from collections import defaultdict
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from rest_framework.authtoken.models import Token
+from core.models import Ingredient, Recipe, Tag
+from core.search import update_search_vectors
+
+SEED_PASSWORD = 'seed-password'
+
+
+def seed(users=1, recipes=100, tags=20, ingredients=50, links=3,
+         prefix='seed', batch_size=1000, rng=None):
+    """Creates users with their recipes, tags, ingredients and tokens
+
+    Everything is written with bulk inserts, one per table and batch,
+    and the password is hashed once for all the users. Each recipe gets
+    up to `links` tags and ingredients picked at random from its user's.
+    Returns the created users.
+    """
+    rng = rng or random.Random(0)
+    User = get_user_model()
+    password = make_password(SEED_PASSWORD)
+    first = User.objects.filter(email__startswith=f'{prefix}-').count()
+    emails = [f'{prefix}-{first + i}@example.com' for i in range(users)]
+    User.objects.bulk_create(
+        [User(email=email, name=email.split('@')[0], password=password)
+         for email in emails],
+        batch_size=batch_size)
+    created = list(User.objects.filter(email__in=emails).order_by('id'))
+
+    Token.objects.bulk_create(
+        [Token(user=user, key=Token.generate_key()) for user in created],
+        batch_size=batch_size)
+    Tag.objects.bulk_create(
+        [Tag(user=user, name=f'Tag {i}')
+         for user in created for i in range(tags)],
+        batch_size=batch_size)
+    Ingredient.objects.bulk_create(
+        [Ingredient(user=user, name=f'Ingredient {i}')
+         for user in created for i in range(ingredients)],
+        batch_size=batch_size)
+    Recipe.objects.bulk_create(
+        [Recipe(user=user, title=f'Recipe {i}',
+                time_minutes=rng.randint(5, 120),
+                price=Decimal(rng.randint(100, 5000)) / 100)
+         for user in created for i in range(recipes)],
+        batch_size=batch_size)
+
+    recipe_ids = Recipe.objects.filter(user__in=created).order_by(
+        'id').values_list('id', 'user_id')
+    for field, model in (('tags', Tag), ('ingredients', Ingredient)):
+        owned = defaultdict(list)
+        for pk, user_id in model.objects.filter(
+                user__in=created).order_by('id').values_list('id', 'user_id'):
+            owned[user_id].append(pk)
+
+        relation = Recipe._meta.get_field(field)
+        through = relation.remote_field.through
+        rows = []
+        for recipe_id, user_id in recipe_ids:
+            count = min(links, len(owned[user_id]))
+            for pk in rng.sample(owned[user_id], rng.randint(0, count)):
+                rows.append(through(**{
+                    relation.m2m_column_name(): recipe_id,
+                    relation.m2m_reverse_name(): pk,
+                }))
+        through.objects.bulk_create(rows, batch_size=batch_size)
+
+    update_search_vectors(Recipe.objects.filter(user__in=created))
+    return created
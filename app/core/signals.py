@@ -0,0 +1,63 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from core.models import Recipe, Tag, Ingredient
+from core.search import search_supported, update_search_vectors
+
+
+def recipes_of(instance):
+    """Returns the ids of the recipes using a tag or ingredient"""
+    return list(instance.recipe_set.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, update_fields=None, **kwargs):
+    """Refreshes the search vector when the title may have changed"""
+    if update_fields is None or 'title' in update_fields:
+        update_search_vectors(Recipe.objects.filter(pk=instance.pk))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def recipe_relations_changed(sender, instance, action, reverse, pk_set,
+                             **kwargs):
+    """Refreshes the search vectors of recipes gaining or losing names"""
+    if not search_supported():
+        return
+    if action == 'pre_clear' and reverse:
+        instance._search_recipe_ids = recipes_of(instance)
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        recipe_ids = [instance.pk]
+    elif action == 'post_clear':
+        recipe_ids = instance._search_recipe_ids
+    else:
+        recipe_ids = pk_set
+    update_search_vectors(Recipe.objects.filter(pk__in=recipe_ids))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def name_saved(sender, instance, created, **kwargs):
+    """Refreshes the recipes using a renamed tag or ingredient"""
+    if not created:
+        update_search_vectors(
+            Recipe.objects.filter(pk__in=instance.recipe_set.values('pk')))
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def name_deleting(sender, instance, **kwargs):
+    """Keeps the recipes of a tag or ingredient before the rows cascade"""
+    if search_supported():
+        instance._search_recipe_ids = recipes_of(instance)
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def name_deleted(sender, instance, **kwargs):
+    """Drops the name of a deleted tag or ingredient from its recipes"""
+    if search_supported():
+        update_search_vectors(
+            Recipe.objects.filter(pk__in=instance._search_recipe_ids))
@@ -0,0 +1,46 @@
+import hashlib
+import os
+import uuid
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+def file_digest(file):
+    """Returns the sha256 hex digest of a file, reading it in chunks"""
+    digest = hashlib.sha256()
+    for chunk in file.chunks():
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """File system storage where equal names hold equal content
+
+    Saving under a name that exists keeps the stored file. New files are
+    written under a temporary name and moved in place, so concurrent
+    uploads of the same content never see a partial file.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def _save(self, name, content):
+        if self.exists(name):
+            return name
+        directory, basename = os.path.split(name)
+        temp_name = os.path.join(directory, f'.{uuid.uuid4().hex}.{basename}')
+        temp_name = super()._save(temp_name, content)
+        return self.move_into_place(temp_name, name)
+
+    def move_into_place(self, temp_name, name):
+        """Moves a file to its content name, dropping it if already there"""
+        if self.exists(name):
+            self.delete(temp_name)
+        else:
+            os.replace(self.path(temp_name), self.path(name))
+        return name
+
+
+content_storage = ContentAddressedStorage()
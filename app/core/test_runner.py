@@ -0,0 +1,39 @@
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class QueryCheckRunner(DiscoverRunner):
+    """Test runner failing the requests flagged by the query checker
+
+    Every request made through the test client raises QueryCheckFailed
+    when it repeats a query shape, or exceeds --query-budget queries.
+    """
+
+    def __init__(self, query_budget=None, query_check=True, **kwargs):
+        super().__init__(**kwargs)
+        self.query_budget = query_budget
+        self.query_check = query_check
+
+    @classmethod
+    def add_arguments(cls, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            '--query-budget', type=int,
+            help='Fail requests running more queries than this.')
+        parser.add_argument(
+            '--no-query-check', action='store_false', dest='query_check',
+            help='Do not check the queries of the requests.')
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        from django.conf import settings
+        config = dict(settings.QUERY_CHECK, ENABLED=self.query_check,
+                      RAISE=True, SLOW_MS=float('inf'))
+        if self.query_budget is not None:
+            config['BUDGET'] = self.query_budget
+        self.query_check_settings = override_settings(QUERY_CHECK=config)
+        self.query_check_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.query_check_settings.disable()
+        super().teardown_test_environment(**kwargs)
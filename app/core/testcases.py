@@ -0,0 +1,24 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+
+class AuthenticatedTestCase(TestCase):
+    """TestCase whose client is logged in as a user shared by its tests
+
+    Every cache is cleared before each test. Rolled back rows give their
+    ids back to SQLite, so a response cached by an earlier test would
+    otherwise be served to the next user created with the same id.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            email='helo@world.com', password='testpass')
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
@@ -6,19 +6,22 @@ from django.urls import reverse
 
 
 class AdminTests(TestCase):
-    def setUp(self):
-        self.client = Client()
-        self.admin_user = get_user_model().objects.create_superuser(
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_user = get_user_model().objects.create_superuser(
             email = 'abdulrehman.ajmal@outlook.com',
             password = 'hello_999'
         )
-        self.client.force_login(self.admin_user)
-        self.user = get_user_model().objects.create_user(
+        cls.user = get_user_model().objects.create_user(
             email = 'oreo@oreo.com',
             password = 'hello_999',
             name = 'abdulrehman'
         )
 
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.admin_user)
+
     def test_user_listed(self):
         url = reverse('admin:core_user_changelist')
         res = self.client.get(url)
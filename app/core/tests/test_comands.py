@@ -1,22 +1,174 @@
+import json
+from datetime import timedelta
+import os
+import shutil
+import tempfile
+from io import StringIO
 from unittest.mock import patch
+from django.contrib.auth import get_user_model
 from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
 from django.db.utils import OperationalError
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from core.models import Ingredient, Recipe, Tag
 
 
 class CommandTests(TestCase):
 
-    def test_wait_for_db_ready(self):
+    @patch('django.db.backends.base.base.BaseDatabaseWrapper.ensure_connection')
+    def test_wait_for_db_ready(self, ensure_connection):
         """Test waiting for db when db is avalible"""
-        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
-            gi.return_value = True
-            call_command('wait_for_db')
-            self.assertEqual(gi.call_count,1)
-    
-    @patch('time.sleep',return_value=True)
-    def test_wait_for_db(self,ts):
-        """Test waiting for db when db is avalible"""
-        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
-            gi.side_effect = [OperationalError] * 5 + [True]
-            call_command('wait_for_db')
-            self.assertEqual(gi.call_count,6)
+        call_command('wait_for_db', stdout=StringIO())
+        self.assertEqual(ensure_connection.call_count, 1)
+
+    @patch('time.sleep', return_value=True)
+    @patch('django.db.backends.base.base.BaseDatabaseWrapper.ensure_connection')
+    def test_wait_for_db(self, ensure_connection, ts):
+        """Test waiting for db backs off until the db connects"""
+        ensure_connection.side_effect = [OperationalError] * 5 + [None]
+        call_command('wait_for_db', stdout=StringIO())
+        self.assertEqual(ensure_connection.call_count, 6)
+        delays = [call.args[0] for call in ts.call_args_list]
+        self.assertEqual(delays, [0.1, 0.2, 0.4, 0.8, 1.6])
+
+    @patch('time.sleep', return_value=True)
+    @patch('django.db.backends.base.base.BaseDatabaseWrapper.ensure_connection')
+    def test_wait_for_db_timeout(self, ensure_connection, ts):
+        """Test waiting for db gives up after the timeout"""
+        ensure_connection.side_effect = OperationalError
+        with self.assertRaises(CommandError):
+            call_command('wait_for_db', timeout=0, stdout=StringIO())
+
+    def test_benchmark_auth(self):
+        """Test the auth benchmark reports the saved queries"""
+        out = StringIO()
+        call_command('benchmark', 'auth', iterations=5, stdout=out)
+        results = json.loads(out.getvalue())['auth']
+        self.assertEqual(
+            results['TokenAuthentication']['queries_per_call'], 1)
+        self.assertLess(
+            results['CachedTokenAuthentication']['queries_per_call'], 1)
+        self.assertFalse(get_user_model().objects.exists())
+
+    def test_benchmark_serialization(self):
+        """Test both serialization paths render the same bytes"""
+        out = StringIO()
+        call_command('benchmark', 'serialization', iterations=10, stdout=out)
+        results = json.loads(out.getvalue())['serialization']
+        self.assertTrue(results['identical'])
+        self.assertEqual(results['values']['queries_per_call'], 3)
+
+    def test_benchmark_api_scenarios(self):
+        """Test the API scenarios run and their results can be compared"""
+        scenarios = ('login', 'list_recipes', 'retrieve_recipe',
+                     'create_recipe', 'upload_image')
+        output = tempfile.NamedTemporaryFile(suffix='.json', delete=False)
+        output.close()
+        self.addCleanup(os.remove, output.name)
+
+        call_command('benchmark', *scenarios, iterations=2,
+                     output=output.name, stdout=StringIO())
+        with open(output.name) as f:
+            report = json.load(f)
+        self.assertEqual(set(report['results']), set(scenarios))
+        for result in report['results'].values():
+            self.assertGreater(result['per_second'], 0)
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+        self.assertEqual(report['database'], connection.vendor)
+        self.assertFalse(get_user_model().objects.exists())
+
+        out = StringIO()
+        call_command('benchmark', 'retrieve_recipe', iterations=2,
+                     compare=output.name, stdout=out)
+        self.assertIn('retrieve_recipe.per_second: ', out.getvalue())
+
+    def test_seed(self):
+        """Test seeding creates the users and their linked data"""
+        call_command('seed', users=2, recipes=5, tags=3, ingredients=4,
+                     links=2, stdout=StringIO())
+        users = get_user_model().objects.filter(email__startswith='seed-')
+        self.assertEqual(users.count(), 2)
+        self.assertEqual(Token.objects.filter(user__in=users).count(), 2)
+        self.assertEqual(Recipe.objects.count(), 10)
+        self.assertEqual(Tag.objects.count(), 6)
+        self.assertEqual(Ingredient.objects.count(), 8)
+        for recipe in Recipe.objects.all():
+            self.assertLessEqual(recipe.tags.count(), 2)
+            self.assertTrue(all(tag.user_id == recipe.user_id
+                                for tag in recipe.tags.all()))
+        self.assertTrue(users[0].check_password('seed-password'))
+
+        call_command('seed', users=1, recipes=0, clear=True,
+                     stdout=StringIO())
+        self.assertEqual(users.count(), 1)
+
+    def test_seed_is_reproducible(self):
+        """Test the same seed links the same tags and ingredients"""
+        def links():
+            return list(Recipe.objects.values_list(
+                'user__email', 'title', 'tags__name', 'ingredients__name'
+            ).order_by('id', 'tags__name', 'ingredients__name'))
+
+        call_command('seed', users=2, recipes=5, seed=7, stdout=StringIO())
+        first = links()
+        call_command('seed', users=2, recipes=5, seed=7, clear=True,
+                     stdout=StringIO())
+        self.assertEqual(links(), first)
+
+    def test_dedupe_images(self):
+        """Test duplicated images are merged under their content hash"""
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        os.makedirs(os.path.join(media_root, 'uploads/recipe'))
+        user = get_user_model().objects.create_user('helo@world.com', 'pass')
+        recipes = []
+        for name in ('first.jpg', 'second.jpg'):
+            with open(os.path.join(media_root, 'uploads/recipe', name),
+                      'wb') as file:
+                file.write(b'same image')
+            recipes.append(Recipe.objects.create(
+                user=user, title=name, time_minutes=5, price='5.00',
+                image=f'uploads/recipe/{name}'))
+
+        with override_settings(MEDIA_ROOT=media_root), \
+                patch('core.management.commands.dedupe_images.process_image'):
+            call_command('dedupe_images', stdout=StringIO())
+
+        names = {recipe.image.name for recipe in Recipe.objects.all()}
+        self.assertEqual(len(names), 1)
+        self.assertEqual(
+            os.listdir(os.path.join(media_root, 'uploads/recipe')),
+            [os.path.basename(names.pop())])
+
+    def test_purge_tokens(self):
+        """Test only expired tokens are purged, in batches"""
+        tokens = [Token.objects.create(user=get_user_model().objects.create(
+            email=f'user{i}@world.com')) for i in range(3)]
+        Token.objects.filter(key__in=[t.key for t in tokens[:2]]).update(
+            created=timezone.now() - timedelta(days=30))
+
+        with patch('core.management.commands.purge_tokens.time.sleep') \
+                as sleep:
+            call_command('purge_tokens', batch_size=1, sleep=0.5,
+                         stdout=StringIO())
+        self.assertEqual(list(Token.objects.values_list('key', flat=True)),
+                         [tokens[2].key])
+        self.assertEqual(sleep.call_count, 1)
+
+
+class BenchmarkConnectionTests(TransactionTestCase):
+
+    def test_benchmark_recipe_list(self):
+        """Test the recipe list is measured in every connection mode"""
+        out = StringIO()
+        call_command('benchmark', 'recipe_list', iterations=3, stdout=out)
+        results = json.loads(out.getvalue())['recipe_list']
+        self.assertEqual(set(results),
+                         {'per_request', 'persistent', 'persistent_checked'})
+        for result in results.values():
+            self.assertEqual(result['iterations'], 3)
+            self.assertGreater(result['queries_per_call'], 0)
+        self.assertFalse(get_user_model().objects.exists())
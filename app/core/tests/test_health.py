@@ -0,0 +1,71 @@
+from unittest.mock import patch
+
+from django.db import connection
+from django.db.utils import OperationalError
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+
+from core.health import check_persistent_connections
+
+
+HEALTHZ_URL = reverse('core:healthz')
+READYZ_URL = reverse('core:readyz')
+
+
+class HealthCheckTests(TestCase):
+
+    def test_healthz(self):
+        """Test the liveness probe answers without authentication"""
+        res = self.client.get(HEALTHZ_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json(), {'status': 'ok'})
+
+    def test_readyz(self):
+        """Test the readiness probe queries the database"""
+        with self.assertNumQueries(1):
+            res = self.client.get(READYZ_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('no-cache', res['Cache-Control'])
+
+    @patch('django.db.backends.base.base.BaseDatabaseWrapper.cursor')
+    def test_readyz_database_down(self, cursor):
+        """Test the readiness probe fails while the database is down"""
+        cursor.side_effect = OperationalError('connection refused')
+        res = self.client.get(READYZ_URL)
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(res.json()['databases'],
+                         {'default': 'connection refused'})
+
+    def test_readyz_rejects_post(self):
+        """Test the probes only answer safe methods"""
+        res = self.client.post(READYZ_URL)
+        self.assertEqual(res.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+
+class PersistentConnectionTests(TestCase):
+
+    def setUp(self):
+        connection.ensure_connection()
+        self.settings_dict = connection.settings_dict
+        self.addCleanup(self.settings_dict.pop, 'CONN_HEALTH_CHECKS', None)
+
+    @patch.object(connection, 'close')
+    def test_dead_connection_closed(self, close):
+        """Test a connection that fails its health check is closed"""
+        self.settings_dict['CONN_HEALTH_CHECKS'] = True
+        with patch.object(connection, 'in_atomic_block', False), \
+                patch.object(connection, 'is_usable', return_value=False):
+            check_persistent_connections()
+        close.assert_called_once()
+
+    @patch.object(connection, 'close')
+    def test_health_checks_disabled(self, close):
+        """Test connections are not pinged without CONN_HEALTH_CHECKS"""
+        self.settings_dict['CONN_HEALTH_CHECKS'] = False
+        with patch.object(connection, 'in_atomic_block', False), \
+                patch.object(connection, 'is_usable') as is_usable:
+            check_persistent_connections()
+        is_usable.assert_not_called()
+        close.assert_not_called()
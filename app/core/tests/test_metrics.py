@@ -0,0 +1,69 @@
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from core.metrics import registry
+from core.models import Recipe
+from core.testcases import AuthenticatedTestCase
+
+RECIPE_URL = reverse('recipe:recipe-list')
+METRICS_URL = reverse('core:metrics')
+
+
+@override_settings(METRICS_ENABLED=True)
+class MetricsTests(AuthenticatedTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Recipe.objects.create(
+            user=cls.user, title='steak', time_minutes=10, price='5.00')
+
+    def setUp(self):
+        registry.clear()
+        super().setUp()
+
+    def test_server_timing(self):
+        """Test the timings of the request are sent back"""
+        res = self.client.get(RECIPE_URL)
+        entries = [entry.strip() for entry in res['Server-Timing'].split(',')]
+        self.assertEqual([entry.split(';')[0] for entry in entries],
+                         ['app', 'db', 'serialize', 'render'])
+        self.assertTrue(entries[1].endswith('desc="3 queries"'))
+
+    def test_prometheus_export(self):
+        """Test the requests are counted per route"""
+        self.client.get(RECIPE_URL)
+        self.client.get(RECIPE_URL)
+
+        res = self.client.get(METRICS_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        body = res.content.decode()
+        self.assertIn('api_requests_total{route="recipe:recipe-list",'
+                      'method="GET",status="200"} 2', body)
+        self.assertIn('api_request_duration_seconds_count'
+                      '{route="recipe:recipe-list"} 2', body)
+        self.assertIn('api_db_queries_total{route="recipe:recipe-list"} 3',
+                      body)
+
+    def test_cache_lookups_exported(self):
+        """Test the hits and misses of the response cache are exported"""
+        self.client.get(RECIPE_URL)
+        self.client.get(RECIPE_URL)
+
+        body = self.client.get(METRICS_URL).content.decode()
+        for result in ('hit', 'miss'):
+            self.assertIn('api_cache_lookups_total{route="recipe:recipe-list",'
+                          f'result="{result}"}} 1', body)
+
+    def test_unmatched_route(self):
+        """Test unknown urls are grouped under one route"""
+        self.client.get('/nowhere')
+        self.assertIn('route="unmatched"', registry.export())
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_disabled(self):
+        """Test nothing is recorded or exposed unless enabled"""
+        res = self.client.get(RECIPE_URL)
+        self.assertFalse(res.has_header('Server-Timing'))
+        self.assertEqual(self.client.get(METRICS_URL).status_code,
+                         status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,57 @@
+import gzip
+from unittest import skipIf
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from core import middleware
+from core.models import Tag
+from core.testcases import AuthenticatedTestCase
+
+TAG_URL = reverse('recipe:tag-list')
+
+
+@override_settings(COMPRESSION_MIN_SIZE=200)
+class CompressionTests(AuthenticatedTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Tag.objects.bulk_create(
+            Tag(user=cls.user, name=f'Tag {i}') for i in range(20))
+
+    def test_gzip(self):
+        """Test large responses are gzipped for clients accepting it"""
+        plain = self.client.get(TAG_URL)
+        res = self.client.get(TAG_URL, HTTP_ACCEPT_ENCODING='gzip, deflate')
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', res['Vary'])
+        self.assertEqual(gzip.decompress(res.content), plain.content)
+        self.assertEqual(res['ETag'], 'W/' + plain['ETag'])
+
+    def test_weak_etag_not_modified(self):
+        """Test the weak ETag of a compressed list still matches"""
+        res = self.client.get(TAG_URL, HTTP_ACCEPT_ENCODING='gzip')
+        res = self.client.get(TAG_URL, HTTP_ACCEPT_ENCODING='gzip',
+                              HTTP_IF_NONE_MATCH=res['ETag'])
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    @override_settings(COMPRESSION_MIN_SIZE=1024 * 1024)
+    def test_small_response(self):
+        """Test responses under the threshold are sent as they are"""
+        res = self.client.get(TAG_URL, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(res.has_header('Content-Encoding'))
+
+    def test_not_accepted(self):
+        """Test responses are not compressed for other clients"""
+        res = self.client.get(TAG_URL, HTTP_ACCEPT_ENCODING='identity')
+        self.assertFalse(res.has_header('Content-Encoding'))
+
+    @skipIf(middleware.brotli is None, 'brotli is not installed')
+    def test_brotli(self):
+        """Test brotli is preferred when the client accepts it"""
+        plain = self.client.get(TAG_URL)
+        res = self.client.get(TAG_URL, HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(res['Content-Encoding'], 'br')
+        self.assertEqual(middleware.brotli.decompress(res.content),
+                         plain.content)
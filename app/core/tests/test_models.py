@@ -2,7 +2,10 @@
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from core import models
-from unittest.mock import patch
+from django.core.files.base import ContentFile
+import hashlib
+import io
+from PIL import Image
 
 
 def sample_user(email='helo@world.com', password='testpass'):
@@ -75,14 +78,23 @@ class ModelTests(TestCase):
         )
         self.assertEqual(str(recipe),recipe.title)
     
-    @patch('uuid.uuid4')
-    def test_recipe_file_name_uuid(self, mock_uuid):
-        """Test that the recipe image has a correct filename"""
-        uuid = 'test-uuid'
-        mock_uuid.return_value = uuid
-        file_path = models.recipe_image_file_path(None,'myfile.jpg')  
-        exp_path = f'uploads/recipe/{uuid}.jpg'  
+    def test_recipe_file_name_content_hash(self):
+        """Test that the recipe image is named after its content"""
+        recipe = models.Recipe(image=ContentFile(b'image', name='myfile.JPG'))
+        file_path = models.recipe_image_file_path(recipe, 'myfile.JPG')
+        digest = hashlib.sha256(b'image').hexdigest()
+        exp_path = f'uploads/recipe/{digest}.jpg'
         self.assertEqual(file_path,exp_path)
 
+    def test_recipe_file_name_follows_image_format(self):
+        """Test the extension of a recipe image comes from its format"""
+        content = io.BytesIO()
+        Image.new('RGB', (10, 10)).save(content, format='PNG')
+        image = ContentFile(content.getvalue(), name='myfile.jpeg')
+        recipe = models.Recipe(image=image)
+        file_path = models.recipe_image_file_path(recipe, 'myfile.jpeg')
+        digest = hashlib.sha256(content.getvalue()).hexdigest()
+        self.assertEqual(file_path, f'uploads/recipe/{digest}.png')
+
 
     
\ No newline at end of file
@@ -0,0 +1,62 @@
+from unittest.mock import patch
+from django.test import override_settings
+from django.urls import reverse
+from core.models import Recipe, Tag
+from core.querycheck import QueryCheckFailed, query_shape
+from core.testcases import AuthenticatedTestCase
+from recipe.views import RecipeViewSet
+
+RECIPE_URL = reverse('recipe:recipe-list')
+
+QUERY_CHECK = {
+    'ENABLED': True, 'REPEATED': 5, 'SLOW_MS': float('inf'),
+    'BUDGET': None, 'RAISE': True,
+}
+
+
+@override_settings(QUERY_CHECK=QUERY_CHECK, API_VALUES_LISTS=False)
+class QueryCheckTests(AuthenticatedTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        tag = Tag.objects.create(user=cls.user, name='Vegan')
+        for i in range(5):
+            recipe = Recipe.objects.create(
+                user=cls.user, title=f'Recipe {i}', time_minutes=5,
+                price='5.00')
+            recipe.tags.add(tag)
+
+    def test_query_shape(self):
+        """Test literals and IN lists do not change the shape"""
+        self.assertEqual(
+            query_shape('SELECT "a" FROM "t" WHERE "b" = %s AND "c" IN '
+                        '(%s, %s) LIMIT 21'),
+            query_shape('SELECT "a" FROM "t" WHERE "b" = \'x\' AND "c" IN '
+                        '(1) LIMIT 5'))
+
+    def test_prefetched_list_passes(self):
+        """Test the recipe list does not repeat queries"""
+        self.client.get(RECIPE_URL)
+
+    def test_n_plus_one_detected(self):
+        """Test a list querying the tags of each recipe is flagged"""
+        with patch.object(RecipeViewSet, 'sparse_queryset',
+                          lambda self, queryset: queryset):
+            with self.assertRaisesRegex(
+                    QueryCheckFailed, r'5 queries .* RecipeSerializer\.tags'):
+                self.client.get(RECIPE_URL)
+
+    @override_settings(QUERY_CHECK=dict(QUERY_CHECK, BUDGET=2))
+    def test_budget_exceeded(self):
+        """Test requests over the query budget are flagged"""
+        with self.assertRaisesRegex(QueryCheckFailed, 'over the budget of 2'):
+            self.client.get(RECIPE_URL)
+
+    @override_settings(QUERY_CHECK=dict(QUERY_CHECK, RAISE=False))
+    def test_logged_outside_tests(self):
+        """Test problems are logged unless asked to raise"""
+        with self.assertLogs('core.querycheck', 'WARNING'):
+            with patch.object(RecipeViewSet, 'sparse_queryset',
+                              lambda self, queryset: queryset):
+                self.client.get(RECIPE_URL)
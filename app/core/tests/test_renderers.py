@@ -0,0 +1,65 @@
+import datetime
+import json
+from decimal import Decimal
+from io import BytesIO
+from django.test import SimpleTestCase
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ErrorDetail, ParseError
+from rest_framework.renderers import JSONRenderer
+from core.renderers import FastJSONParser, FastJSONRenderer
+
+
+class FastJSONTests(SimpleTestCase):
+
+    def test_render_matches_json_renderer(self):
+        """Test the output is byte for byte the one of JSONRenderer"""
+        data = {
+            'price': Decimal('5.50'),
+            'created': datetime.datetime(
+                2021, 9, 1, 12, 30, 15, 123456, tzinfo=datetime.timezone.utc),
+            'day': datetime.date(2021, 9, 1),
+            'title': 'Crème brûlée \u2028\u2029',
+            'detail': ErrorDetail('Invalid pk', code='invalid'),
+            'lazy': gettext_lazy('This field is required.'),
+            'ids': {3, 1},
+            'nested': [{'a': 1.5, 'b': None, 'c': True}],
+            1: 'int key',
+        }
+        self.assertEqual(FastJSONRenderer().render(data),
+                         JSONRenderer().render(data))
+
+    def test_render_large_int_falls_back(self):
+        """Test integers orjson refuses are rendered by JSONRenderer"""
+        data = {'id': 2 ** 64, 'nested': [-2 ** 70]}
+        self.assertEqual(FastJSONRenderer().render(data),
+                         JSONRenderer().render(data))
+
+    def test_render_floats(self):
+        """Test floats keep their value, not their exponent notation"""
+        data = [1e16, 1e-07, 2.5e-05, 1.5, 0.1]
+        self.assertEqual(FastJSONRenderer().render(data),
+                         b'[1e16,1e-7,0.000025,1.5,0.1]')
+        self.assertEqual(json.loads(FastJSONRenderer().render(data)), data)
+
+    def test_render_non_finite_floats(self):
+        """Test NaN and infinities are written as null"""
+        data = [float('nan'), float('inf')]
+        self.assertEqual(FastJSONRenderer().render(data), b'[null,null]')
+
+    def test_render_indented(self):
+        """Test indented output is left to JSONRenderer"""
+        data = {'a': [1, 2]}
+        media_type = 'application/json; indent=4'
+        self.assertEqual(FastJSONRenderer().render(data, media_type),
+                         JSONRenderer().render(data, media_type))
+
+    def test_parse(self):
+        """Test request bodies are parsed"""
+        data = FastJSONParser().parse(
+            BytesIO('{"title": "Crème", "ids": [1, 2]}'.encode()))
+        self.assertEqual(data, {'title': 'Crème', 'ids': [1, 2]})
+
+    def test_parse_error(self):
+        """Test malformed bodies are answered with a parse error"""
+        with self.assertRaises(ParseError):
+            FastJSONParser().parse(BytesIO(b'{"title": '))
@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.http import Http404, HttpResponse, JsonResponse
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_safe
+
+from core.health import database_errors
+from core.metrics import registry
+
+
+@never_cache
+@require_safe
+def healthz(request):
+    """Liveness probe: the process is up and serving requests"""
+    return JsonResponse({'status': 'ok'})
+
+
+@never_cache
+@require_safe
+def readyz(request):
+    """Readiness probe: every database answers a trivial query"""
+    errors = database_errors()
+    if errors:
+        return JsonResponse(
+            {'status': 'unavailable', 'databases': errors}, status=503)
+    return JsonResponse({'status': 'ok'})
+
+
+@never_cache
+@require_safe
+def metrics(request):
+    """Prometheus metrics of this process, when METRICS_ENABLED is set"""
+    if not settings.METRICS_ENABLED:
+        raise Http404
+    return HttpResponse(registry.export(),
+                        content_type='text/plain; version=0.0.4')
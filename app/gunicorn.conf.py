@@ -0,0 +1,77 @@
+"""Gunicorn settings of the production server, read from the environment
+
+Run from the app directory with ``gunicorn``; GUNICORN_WORKER_CLASS set
+to ``uvicorn.workers.UvicornWorker`` serves app.asgi instead of app.wsgi.
+"""
+import multiprocessing
+import os
+import threading
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+workers = int(os.environ.get(
+    'WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 2))
+
+# The response cache generations and the login throttles must be shared
+# by the workers, which a per-process LocMemCache cannot do.
+cache_backend = os.environ.get(
+    'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache')
+if workers > 1 and cache_backend.endswith('.LocMemCache'):
+    raise RuntimeError(
+        f'{workers} workers cannot share a LocMemCache; set CACHE_BACKEND '
+        'and CACHE_LOCATION to a shared cache or WEB_CONCURRENCY to 1')
+wsgi_app = ('app.asgi:application' if worker_class.startswith('uvicorn.')
+            else 'app.wsgi:application')
+
+# Importing the app before forking shares its memory copy-on-write
+# between the workers, which are recycled after max_requests (plus up to
+# max_requests_jitter so they do not all restart at once) to bound leaks.
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+worker_tmp_dir = os.environ.get('GUNICORN_WORKER_TMP_DIR', '/dev/shm')
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-') or None
+
+
+def pre_fork(server, worker):
+    """Never hand a database connection of the master to a worker"""
+    from django.db import connections
+    connections.close_all()
+
+
+def post_worker_init(worker):
+    """Connect the threads that will serve requests to the database
+
+    Django connections are per thread, so a gthread worker connects each
+    thread of its pool, which a barrier keeps busy until all of them have
+    connected. Uvicorn workers query from threads created on demand and
+    are not warmed up.
+    """
+    if os.environ.get('DB_WARMUP', '0') != '1':
+        return
+    from core.health import warm_up
+
+    pool = getattr(worker, 'tpool', None)
+    if pool is None:
+        if not worker_class.startswith('uvicorn.'):
+            warm_up()
+        return
+
+    barrier = threading.Barrier(worker.cfg.threads)
+
+    def warm_up_thread():
+        warm_up()
+        try:
+            barrier.wait(timeout=graceful_timeout)
+        except threading.BrokenBarrierError:
+            pass
+
+    futures = [pool.submit(warm_up_thread)
+               for _ in range(worker.cfg.threads)]
+    for future in futures:
+        future.result()
@@ -0,0 +1,63 @@
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections
+from core.health import check_persistent_connections
+
+executor = None
+
+
+def get_executor():
+    """Returns the pool running the API views, created on first use"""
+    global executor
+    if executor is None:
+        executor = ThreadPoolExecutor(
+            max_workers=settings.API_ASYNC_THREADS,
+            thread_name_prefix='api')
+    return executor
+
+
+def run_view(view, request, args, kwargs):
+    """Runs a sync view and renders its response on a pool thread
+
+    The handler only recycles the connections of its own thread, so the
+    pool thread does it around each request.
+    """
+    close_old_connections()
+    check_persistent_connections()
+    try:
+        response = view(request, *args, **kwargs)
+        if callable(getattr(response, 'render', None)):
+            response.render()
+        return response
+    finally:
+        close_old_connections()
+
+
+class AsyncViewSetMixin:
+    """Serves the viewset from the event loop when API_ASYNC_VIEWS is on
+
+    Django 3.2 has no async ORM and DRF views are sync, so under ASGI the
+    handler would run every request on its single sync thread. The views
+    become coroutines instead: the event loop holds the connections of
+    slow clients while the queries, serialization and rendering run
+    concurrently on API_ASYNC_THREADS threads, each with its own database
+    connection.
+    """
+
+    @classmethod
+    def as_view(cls, actions=None, **initkwargs):
+        view = super().as_view(actions, **initkwargs)
+        if not settings.API_ASYNC_VIEWS:
+            return view
+
+        async def async_view(request, *args, **kwargs):
+            loop = asyncio.get_running_loop()
+            context = contextvars.copy_context()
+            return await loop.run_in_executor(
+                get_executor(), functools.partial(
+                    context.run, run_view, view, request, args, kwargs))
+
+        return functools.update_wrapper(async_view, view)
@@ -0,0 +1,156 @@
+from collections import defaultdict
+from django.conf import settings
+from django.db import connection, transaction
+from rest_framework import serializers, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from recipe.cache import invalidate_user_on_commit
+from recipe.filters import through_table
+
+
+def insert(model, objs):
+    """Inserts the objects and sets their primary keys
+
+    Databases that cannot return the new rows from a bulk insert, like
+    SQLite, read the keys back as the newest rows: SQLite holds its write
+    lock from the first insert until the commit, so no other rows can
+    come in between.
+    """
+    if connection.features.can_return_rows_from_bulk_insert:
+        return model.objects.bulk_create(objs)
+    with transaction.atomic():
+        model.objects.bulk_create(objs)
+        pks = model.objects.order_by('-pk').values_list(
+            'pk', flat=True)[:len(objs)]
+        for obj, pk in zip(objs, reversed(pks)):
+            obj.pk = pk
+    return objs
+
+
+def is_id(value):
+    """Returns whether a JSON value is an id, which a boolean is not"""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def resolve_ids(model, user, ids):
+    """Returns which of the ids are tags or ingredients of the user"""
+    if not ids:
+        return set()
+    return set(model.objects.filter(user=user, pk__in=ids).values_list(
+        'pk', flat=True))
+
+
+def set_relations(field, wanted, created=False):
+    """Sets the tags or ingredients of recipes by diffing the through rows
+
+    `wanted` maps recipe ids to the ids they should be related to. At
+    most one select, one delete and one bulk insert are issued; the
+    select is skipped for recipes that were just created. Returns
+    whether any row changed.
+    """
+    through, target = through_table(field)
+    column = f'{target}_id'
+    current = defaultdict(dict)
+    if not created:
+        rows = through.objects.filter(recipe_id__in=wanted).values_list(
+            'pk', 'recipe_id', column)
+        for pk, recipe_id, target_id in rows:
+            current[recipe_id][target_id] = pk
+
+    stale, new_rows = [], []
+    for recipe_id, target_ids in wanted.items():
+        existing = current[recipe_id]
+        stale += [pk for target_id, pk in existing.items()
+                  if target_id not in target_ids]
+        new_rows += [through(recipe_id=recipe_id, **{column: target_id})
+                     for target_id in target_ids if target_id not in existing]
+
+    if stale:
+        through.objects.filter(pk__in=stale).delete()
+    if new_rows:
+        through.objects.bulk_create(new_rows)
+    return bool(stale or new_rows)
+
+
+class BulkMixin:
+    """Adds create, update and delete of many objects at /bulk/
+
+    POST takes a list of objects, PATCH a list of objects with their
+    `id` and DELETE an object with a list of `ids`. Invalid payloads are
+    answered with one error object per item and nothing is written.
+    """
+
+    @action(methods=['POST', 'PATCH', 'DELETE'], detail=False)
+    def bulk(self, request):
+        if request.method == 'DELETE':
+            return self.bulk_destroy(request)
+
+        items = request.data
+        if not isinstance(items, list):
+            raise serializers.ValidationError('Expected a list of items.')
+        if len(items) > settings.API_MAX_BULK_SIZE:
+            raise serializers.ValidationError(
+                f'At most {settings.API_MAX_BULK_SIZE} items are allowed.')
+
+        partial = request.method == 'PATCH'
+        serializer = self.get_serializer(data=items, many=True,
+                                         partial=partial)
+        serializer.is_valid()
+        errors = serializer.errors or [{} for _ in items]
+        instances = self.bulk_instances(items, errors) if partial else None
+        if not any(errors):
+            self.check_bulk_items(serializer.validated_data, errors)
+        if any(errors):
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            objs = self.bulk_write(serializer.validated_data, instances)
+        invalidate_user_on_commit(request.user.pk)
+        return Response(
+            self.bulk_representation(objs),
+            status=status.HTTP_200_OK if partial else status.HTTP_201_CREATED
+        )
+
+    def bulk_instances(self, items, errors):
+        """Fetches the objects to update in one query"""
+        ids = [item.get('id') if isinstance(item, dict) else None
+               for item in items]
+        ids = [pk if is_id(pk) else None for pk in ids]
+        found = self.get_queryset().in_bulk(
+            [pk for pk in ids if pk is not None])
+        instances = []
+        for pk, item_errors in zip(ids, errors):
+            if pk not in found:
+                item_errors['id'] = ['Object does not exist.']
+            instances.append(found.get(pk))
+        return instances
+
+    def bulk_destroy(self, request):
+        ids = request.data.get('ids') if isinstance(request.data, dict) else None
+        if not isinstance(ids, list) or not all(is_id(pk) for pk in ids):
+            raise serializers.ValidationError(
+                {'ids': 'Expected a list of ids.'})
+        self.get_queryset().filter(pk__in=ids).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    def check_bulk_items(self, validated_data, errors):
+        """Adds the errors found across all items to `errors`"""
+
+    def bulk_write(self, validated_data, instances):
+        """Creates the objects, or updates `instances`, and returns them"""
+        model = self.get_queryset().model
+        if instances is None:
+            return insert(model, [model(user=self.request.user, **data)
+                                  for data in validated_data])
+
+        fields = set()
+        for obj, data in zip(instances, validated_data):
+            for name, value in data.items():
+                setattr(obj, name, value)
+                fields.add(name)
+        if fields:
+            model.objects.bulk_update(instances, fields)
+        return instances
+
+    def bulk_representation(self, objs):
+        return self.get_serializer(objs, many=True).data
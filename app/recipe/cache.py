@@ -0,0 +1,158 @@
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+from core.metrics import registry, route_of
+
+
+def get_cache():
+    return caches[settings.API_CACHE_ALIAS]
+
+
+def generation_key(user_id):
+    return f'api:generation:{user_id}'
+
+
+def changed_key(user_id):
+    return f'api:changed:{user_id}'
+
+
+def get_state(user_id):
+    """Returns the cache generation and last change time of the user
+
+    Until a change is recorded the time is the first lookup, so clients
+    refetch once after the cache is emptied.
+    """
+    cache = get_cache()
+    keys = [generation_key(user_id), changed_key(user_id)]
+    state = cache.get_many(keys)
+    if len(state) < len(keys):
+        initial = {keys[0]: time.time_ns(), keys[1]: time.time()}
+        for key, value in initial.items():
+            cache.add(key, value, None)
+        state = {**initial, **cache.get_many(keys)}
+    return state[keys[0]], state[keys[1]]
+
+
+def get_generation(user_id):
+    """Returns the current cache generation of the user"""
+    return get_state(user_id)[0]
+
+
+def invalidate_user(user_id):
+    """Drops every cached response of the user by moving its generation"""
+    cache = get_cache()
+    key = generation_key(user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+    cache.set(changed_key(user_id), time.time(), None)
+
+
+def invalidate_user_on_commit(user_id):
+    """Invalidates the user once the current transaction commits
+
+    Invalidating earlier would let a concurrent request cache the rows
+    it still sees under the new generation, until the entry expires.
+    """
+    transaction.on_commit(lambda: invalidate_user(user_id))
+
+
+def cache_stats():
+    """Returns the hit and miss counters of this process, for all routes
+
+    The counters per route are exported by /metrics.
+    """
+    totals = {'hits': 0, 'misses': 0, 'not_modified': 0}
+    names = {'hit': 'hits', 'miss': 'misses', 'not_modified': 'not_modified'}
+    with registry.lock:
+        for (route, result), count in registry.cache_results.items():
+            totals[names[result]] += count
+    return totals
+
+
+def response_key(request, generation):
+    """Key of a response for the user, generation, url and format"""
+    url = request.build_absolute_uri()
+    fmt = request.accepted_renderer.format
+    digest = hashlib.sha1(f'{url}|{fmt}'.encode()).hexdigest()
+    return f'api:response:{request.user.pk}:{generation}:{digest}'
+
+
+def etag_matches(etag, if_none_match):
+    """Weakly compares the ETag to an If-None-Match header
+
+    Compressed responses carry the weak form W/"..." of the ETag.
+    """
+    if if_none_match.strip() == '*':
+        return True
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    return etag in [tag[2:] if tag.startswith('W/') else tag for tag in tags]
+
+
+def last_modified(changed):
+    """Returns the Last-Modified header of the last write, if it can be sent
+
+    HTTP dates have whole seconds, so while the second of the last write
+    lasts another write could follow under the same date and the header
+    is left out.
+    """
+    if int(changed) >= int(time.time()):
+        return None
+    return http_date(changed)
+
+
+def not_modified_since(changed, if_modified_since):
+    """Returns whether nothing changed since an If-Modified-Since header
+
+    Only a second that is over can vouch for every write made in it.
+    """
+    since = parse_http_date_safe(if_modified_since)
+    return (since is not None
+            and int(changed) <= since < int(time.time()))
+
+
+class CachedListMixin:
+    """Caches the list responses of a viewset per user
+
+    The ETag is derived from the cache key and Last-Modified from the
+    last write of the user, so a client polling with If-None-Match or
+    If-Modified-Since is answered without querying or serializing
+    anything.
+    """
+
+    def list(self, request, *args, **kwargs):
+        generation, changed = get_state(request.user.pk)
+        key = response_key(request, generation)
+        etag = '"%s"' % hashlib.sha1(key.encode()).hexdigest()
+        headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+        modified = last_modified(changed)
+        if modified is not None:
+            headers['Last-Modified'] = modified
+
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if_modified_since = request.META.get('HTTP_IF_MODIFIED_SINCE')
+        if (etag_matches(etag, if_none_match) if if_none_match is not None
+                else if_modified_since is not None
+                and not_modified_since(changed, if_modified_since)):
+            registry.count_cache(route_of(request), 'not_modified')
+            return Response(status=status.HTTP_304_NOT_MODIFIED,
+                            headers=headers)
+
+        data = get_cache().get(key)
+        if data is not None:
+            registry.count_cache(route_of(request), 'hit')
+            return Response(data, headers=headers)
+
+        registry.count_cache(route_of(request), 'miss')
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            get_cache().set(key, response.data, settings.API_CACHE_TIMEOUT)
+            for name, value in headers.items():
+                response[name] = value
+        return response
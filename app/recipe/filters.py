@@ -0,0 +1,97 @@
+from django.db.backends.base.operations import BaseDatabaseOperations
+from django.db.models import Count, Exists, OuterRef
+from rest_framework import filters
+from rest_framework.exceptions import ValidationError
+from core.models import Recipe
+from core.search import search_recipes
+
+
+def parse_ids(value, param, model):
+    """Converts a comma separated query parameter into a set of ids
+
+    Ids out of the range of the model's primary key column are rejected
+    here, as the database would fail on them. The range is taken from the
+    base operations because SQLite reports none, yet holds 64 bits.
+    """
+    low, high = BaseDatabaseOperations.integer_field_ranges[
+        model._meta.pk.get_internal_type()]
+    try:
+        ids = {int(str_id) for str_id in value.split(',') if str_id}
+        if not all(low <= pk <= high for pk in ids):
+            raise ValueError
+    except ValueError:
+        raise ValidationError({param: 'Expected a comma separated list of ids.'})
+    return ids
+
+
+def query_flag(request, param):
+    """Returns whether a boolean query parameter is switched on"""
+    return request.query_params.get(param) in ('1', 'true')
+
+
+def through_table(field):
+    """Returns the through model of the recipe relation and its target"""
+    relation = Recipe._meta.get_field(field)
+    return relation.remote_field.through, relation.m2m_reverse_field_name()
+
+
+class RecipeRelationFilter(filters.BaseFilterBackend):
+    """Filters recipes by ?tags=1,2&ingredients=3 with ?match=any|all
+
+    The lookups run as sub-queries on the indexed through tables, so a
+    recipe matching several ids is returned once without a DISTINCT.
+    """
+    relations = ('tags', 'ingredients')
+
+    def filter_queryset(self, request, queryset, view):
+        match = request.query_params.get('match', 'any')
+        if match not in ('any', 'all'):
+            raise ValidationError({'match': 'Expected "any" or "all".'})
+
+        for field in self.relations:
+            value = request.query_params.get(field)
+            if not value:
+                continue
+            ids = parse_ids(
+                value, field, Recipe._meta.get_field(field).related_model)
+            through, target = through_table(field)
+            recipe_ids = through.objects.filter(**{f'{target}__in': ids})
+            if match == 'all':
+                recipe_ids = recipe_ids.values('recipe').annotate(
+                    matched=Count(target)).filter(matched=len(ids))
+            queryset = queryset.filter(id__in=recipe_ids.values('recipe'))
+        return queryset
+
+
+class AssignedOnlyFilter(filters.BaseFilterBackend):
+    """Limits tags or ingredients to those used by a recipe"""
+
+    def filter_queryset(self, request, queryset, view):
+        if not query_flag(request, 'assigned_only'):
+            return queryset
+        through, target = through_table(view.recipe_field)
+        return queryset.filter(Exists(
+            through.objects.filter(**{target: OuterRef('pk')})))
+
+
+class RecipeCountFilter(filters.BaseFilterBackend):
+    """Annotates tags or ingredients with ?with_counts=1 by recipe_count
+
+    One grouped query over the (tag_id, recipe_id) covering index of the
+    through table counts the recipes of every listed name at once.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        if not query_flag(request, 'with_counts'):
+            return queryset
+        return queryset.annotate(recipe_count=Count('recipe'))
+
+
+class RecipeSearchFilter(filters.BaseFilterBackend):
+    """Full text search of the recipes with ?search=text"""
+
+    def filter_queryset(self, request, queryset, view):
+        text = request.query_params.get('search', '').strip()
+        if not text:
+            return queryset
+        return search_recipes(queryset, text)
@@ -0,0 +1,130 @@
+import hashlib
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, connection, transaction
+from PIL import Image, ImageOps, features
+from core.models import Recipe
+from core.storage import content_storage
+
+logger = logging.getLogger(__name__)
+
+executor = None
+
+
+def get_executor():
+    """Returns the worker pool, created on first use in each process"""
+    global executor
+    if executor is None:
+        executor = ThreadPoolExecutor(
+            max_workers=settings.RECIPE_IMAGE_WORKERS,
+            thread_name_prefix='recipe-image')
+    return executor
+
+
+def rendition_format():
+    """Returns WebP when Pillow was built with it, JPEG otherwise"""
+    return 'WEBP' if features.check('webp') else 'JPEG'
+
+
+def rendition_path(image_name, size_name, fmt):
+    """Returns the storage path of a rendition of the image"""
+    stem = os.path.splitext(os.path.basename(image_name))[0]
+    ext = 'webp' if fmt == 'WEBP' else 'jpg'
+    return f'uploads/recipe/renditions/{stem}_{size_name}.{ext}'
+
+
+def schedule_processing(recipe):
+    """Queues the renditions of the recipe image once the upload commits"""
+    recipe_id, image_name = recipe.pk, recipe.image.name
+    if settings.RECIPE_IMAGE_WORKERS:
+        transaction.on_commit(lambda: get_executor().submit(
+            process_image, recipe_id, image_name))
+    else:
+        transaction.on_commit(lambda: process_image(recipe_id, image_name))
+
+
+def render(image, size, fmt):
+    """Encodes a copy of the image no larger than size, without metadata"""
+    copy = image.copy()
+    if size:
+        copy.thumbnail(size, Image.LANCZOS)
+    buffer = io.BytesIO()
+    copy.save(buffer, fmt, quality=settings.RECIPE_IMAGE_QUALITY)
+    return buffer.getvalue()
+
+
+def process_image(recipe_id, image_name):
+    """Writes the renditions of an uploaded image and records them
+
+    The renditions are re-encoded from pixel data only, so EXIF and
+    other metadata of the upload are dropped. Images are stored by
+    content, so renditions already made for another recipe are reused.
+    The result is discarded if another image was uploaded meanwhile.
+    """
+    fmt = rendition_format()
+    try:
+        renditions = {
+            size_name: rendition_path(image_name, size_name, fmt)
+            for size_name in settings.RECIPE_IMAGE_RENDITIONS}
+        missing = {size_name: path for size_name, path in renditions.items()
+                   if not content_storage.exists(path)}
+        if missing:
+            with content_storage.open(image_name) as upload:
+                image = ImageOps.exif_transpose(Image.open(upload))
+                image = image.convert('RGB')
+            for size_name, path in missing.items():
+                size = settings.RECIPE_IMAGE_RENDITIONS[size_name]
+                content_storage.save(
+                    path, ContentFile(render(image, size, fmt)))
+        status = Recipe.IMAGE_READY
+    except Exception:
+        logger.exception('Processing image %s failed', image_name)
+        renditions, status = {}, Recipe.IMAGE_FAILED
+
+    try:
+        Recipe.objects.filter(pk=recipe_id, image=image_name).update(
+            image_status=status, image_renditions=renditions)
+    finally:
+        if settings.RECIPE_IMAGE_WORKERS:
+            close_old_connections()
+
+
+def lock_image(image_name):
+    """Holds a lock on an image name until the transaction ends
+
+    Uploads take it before pointing a recipe at a stored file and
+    release_image before deleting one, so a release sees every reference
+    committed before it and an upload never reuses a file being deleted.
+    PostgreSQL uses an advisory lock on a hash of the name; the no-op
+    update makes SQLite take its database write lock instead.
+    """
+    if connection.vendor == 'postgresql':
+        key = int(hashlib.sha256(image_name.encode()).hexdigest()[:15], 16)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [key])
+    else:
+        Recipe.objects.filter(image=image_name).update(image=image_name)
+
+
+def release_image(image_name):
+    """Deletes an image and its renditions once no recipe references it
+
+    References are counted with a query on the indexed image column,
+    under the lock of the name so a concurrent upload of the same
+    content either keeps the file or stores it again.
+    """
+    if not image_name:
+        return
+    with transaction.atomic():
+        lock_image(image_name)
+        if Recipe.objects.filter(image=image_name).exists():
+            return
+        content_storage.delete(image_name)
+        for size_name in settings.RECIPE_IMAGE_RENDITIONS:
+            for fmt in ('WEBP', 'JPEG'):
+                content_storage.delete(
+                    rendition_path(image_name, size_name, fmt))
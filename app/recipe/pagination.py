@@ -0,0 +1,33 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class BaseCursorPagination(CursorPagination):
+    """Keyset pagination with a configurable page size ceiling"""
+    page_size_query_param = 'page_size'
+
+    def get_page_size(self, request):
+        """Returns the requested page size capped by the settings"""
+        self.page_size = settings.API_PAGE_SIZE
+        self.max_page_size = settings.API_MAX_PAGE_SIZE
+        return super().get_page_size(request)
+
+
+class NameCursorPagination(BaseCursorPagination):
+    """Paginates tags and ingredients by name"""
+    ordering = '-name'
+
+
+class RecipeCursorPagination(BaseCursorPagination):
+    """Paginates recipes by id unless another ordering is requested"""
+    ordering = 'id'
+
+    def get_ordering(self, request, queryset, view):
+        """Orders ranked search results by relevance, then newest first
+
+        The cursor skips the results tied with the last rank of a page by
+        counting them, so the ties need a stable order.
+        """
+        if 'rank' in queryset.query.annotations:
+            return ('-rank', '-id')
+        return super().get_ordering(request, queryset, view)
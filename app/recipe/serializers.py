@@ -1,50 +1,215 @@
-
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
 from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
 from core.models import Tag, Ingredient, Recipe
+from core.metrics import TimedListSerializer, TimedSerializerMixin
+from core.search import update_search_vectors
+from core.storage import content_storage
+from recipe.bulk import resolve_ids, set_relations
+from recipe.cache import invalidate_user_on_commit
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for tags"""
 
     class Meta:
         model = Tag
+        list_serializer_class = TimedListSerializer
         fields = ['id', 'name']
         read_only_fields = ['id']
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(TimedSerializerMixin,
+                           serializers.ModelSerializer):
     """Serializer for Ingredient objects"""
 
     class Meta:
         model = Ingredient
+        list_serializer_class = TimedListSerializer
         fields = ['id', 'name']
         read_only_fields = ['id']
 
 
-class RecipeSerializer(serializers.ModelSerializer):
-    """Serializer for recipe objects"""
-    ingredients = serializers.PrimaryKeyRelatedField(
+class TagCountSerializer(TagSerializer):
+    """Serializer for tags with the number of recipes using them"""
+    recipe_count = serializers.IntegerField(read_only=True)
+
+    class Meta(TagSerializer.Meta):
+        fields = TagSerializer.Meta.fields + ['recipe_count']
+
+
+class IngredientCountSerializer(IngredientSerializer):
+    """Serializer for ingredients with the number of recipes using them"""
+    recipe_count = serializers.IntegerField(read_only=True)
+
+    class Meta(IngredientSerializer.Meta):
+        fields = IngredientSerializer.Meta.fields + ['recipe_count']
+
+
+class OwnedManyRelatedField(serializers.ManyRelatedField):
+    """List of primary keys resolved against the user's objects at once"""
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+
+        child = self.child_relation
+        pk_field = child.queryset.model._meta.pk
+        ids = []
+        for item in data:
+            try:
+                ids.append(pk_field.to_python(item))
+            except DjangoValidationError:
+                child.fail('incorrect_type', data_type=type(item).__name__)
+        ids = list(dict.fromkeys(ids))
+
+        owned = child.owned_ids(ids)
+        missing = [pk for pk in ids if pk not in owned]
+        if missing:
+            raise serializers.ValidationError([
+                child.error_messages['does_not_exist'].format(pk_value=pk)
+                for pk in missing])
+        return ids
+
+
+class OwnedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Primary key of a tag or ingredient of the requesting user
+
+    With many=True the ids are checked in a single query and validated
+    as a list of ids rather than of objects.
+    """
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return OwnedManyRelatedField(**list_kwargs)
+
+    def get_queryset(self):
+        request = self.context.get('request')
+        if request is None:
+            return super().get_queryset().none()
+        return super().get_queryset().filter(user=request.user)
+
+    def owned_ids(self, ids):
+        """Returns which of the ids belong to the requesting user"""
+        request = self.context.get('request')
+        if request is None:
+            return set()
+        return resolve_ids(self.queryset.model, request.user, ids)
+
+
+class RecipeSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """Serializer for recipe objects
+
+    A "fields" set in the context keeps only those fields and an "expand"
+    set nests the named relations instead of listing their ids.
+    """
+    ingredients = OwnedPrimaryKeyRelatedField(
         many=True, queryset=Ingredient.objects.all())
 
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = OwnedPrimaryKeyRelatedField(
         many=True, queryset=Tag.objects.all())
 
+    expandable = {'tags': TagSerializer, 'ingredients': IngredientSerializer}
+    default_expand = ()
+    relations = ('tags', 'ingredients')
+
     class Meta:
         model = Recipe
+        list_serializer_class = TimedListSerializer
         fields = ['id', 'title', 'ingredients',
                   'tags', 'time_minutes', 'price', 'link']
         read_only_fields = ['id']
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = self.context.get('fields')
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+        expand = self.context.get('expand')
+        if expand is None:
+            return
+        for name in self.expandable:
+            if name not in self.fields:
+                continue
+            if name in expand:
+                self.fields[name] = self.expandable[name](
+                    many=True, read_only=True)
+            elif name in self.default_expand:
+                self.fields[name] = serializers.PrimaryKeyRelatedField(
+                    many=True, read_only=True)
+
+    def create(self, validated_data):
+        """Creates the recipe and inserts its through rows in bulk"""
+        relations = self.pop_relations(validated_data)
+        with transaction.atomic():
+            recipe = super().create(validated_data)
+            self.write_relations(recipe, relations, created=True)
+        return recipe
+
+    def update(self, instance, validated_data):
+        """Updates the recipe and only the through rows that changed"""
+        relations = self.pop_relations(validated_data)
+        with transaction.atomic():
+            recipe = super().update(instance, validated_data)
+            self.write_relations(recipe, relations)
+        return recipe
+
+    def pop_relations(self, validated_data):
+        return {field: set(validated_data.pop(field))
+                for field in self.relations if field in validated_data}
+
+    def write_relations(self, recipe, relations, created=False):
+        """Diffs the through rows instead of clearing and adding them
+
+        set_relations skips the m2m_changed signals, so the search vector
+        and the cached responses are refreshed here instead.
+        """
+        changed = False
+        for field, ids in relations.items():
+            changed |= set_relations(field, {recipe.pk: ids}, created)
+        if changed:
+            update_search_vectors(Recipe.objects.filter(pk=recipe.pk))
+            invalidate_user_on_commit(recipe.user_id)
+
 
 class RecipeDetailSerializer(RecipeSerializer):
     """Serializer for detail recipe objects"""
+    default_expand = ('tags', 'ingredients')
 
     ingredients = IngredientSerializer(many = True, read_only = True)
     tags = TagSerializer(many=True,read_only=True)
 
-class RecipeImageSerializer(serializers.ModelSerializer):
+class RecipeBulkSerializer(RecipeSerializer):
+    """Serializer validating many recipes without a query per related id"""
+    ingredients = serializers.ListField(child=serializers.IntegerField())
+    tags = serializers.ListField(child=serializers.IntegerField())
+
+
+class RecipeImageSerializer(TimedSerializerMixin,
+                            serializers.ModelSerializer):
+    """Serializer for recipe images and their renditions"""
+    renditions = serializers.SerializerMethodField()
+
     class Meta:
         model = Recipe
-        fields = ['id','image']
-        read_only_fields = ['id']
+        list_serializer_class = TimedListSerializer
+        fields = ['id', 'image', 'image_status', 'renditions']
+        read_only_fields = ['id', 'image_status']
+
+    def get_renditions(self, recipe):
+        """Returns the urls of the processed renditions"""
+        request = self.context.get('request')
+        urls = {}
+        for name, path in recipe.image_renditions.items():
+            url = content_storage.url(path)
+            urls[name] = request.build_absolute_uri(url) if request else url
+        return urls
 
@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from core.models import Recipe, Tag, Ingredient
+from recipe.cache import invalidate_user_on_commit
+from recipe.images import release_image
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def object_changed(sender, instance, **kwargs):
+    """Invalidates the cached responses of the owner"""
+    invalidate_user_on_commit(getattr(instance, 'user_id', instance.pk))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def recipe_relations_changed(sender, instance, action, reverse, pk_set,
+                             **kwargs):
+    """Invalidates the owners of the recipes whose relations changed"""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    invalidate_user_on_commit(instance.user_id)
+    if reverse and pk_set:
+        user_ids = Recipe.objects.filter(pk__in=pk_set).exclude(
+            user_id=instance.user_id).values_list('user_id', flat=True)
+        for user_id in set(user_ids):
+            invalidate_user_on_commit(user_id)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_image_saved(sender, instance, **kwargs):
+    """Releases the previous image of a recipe once it is replaced"""
+    if 'image' in instance.get_deferred_fields():
+        return
+    previous = getattr(instance, '_loaded_image', None)
+    instance._loaded_image = instance.image.name
+    if previous and previous != instance.image.name:
+        transaction.on_commit(lambda: release_image(previous))
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_image_deleted(sender, instance, **kwargs):
+    """Releases the image of a deleted recipe"""
+    if 'image' in instance.get_deferred_fields() or not instance.image:
+        return
+    name = instance.image.name
+    transaction.on_commit(lambda: release_image(name))
@@ -0,0 +1,77 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIRequestFactory
+from core.models import Recipe, Tag
+from recipe import async_views
+from recipe.views import RecipeViewSet, TagViewSet
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAG_URL = reverse('recipe:tag-list')
+
+
+class AsyncViewTest(TransactionTestCase):
+    """Test the viewsets served as coroutines"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='helo@world.com', password='testpass')
+        self.token = Token.objects.create(user=self.user)
+        self.factory = APIRequestFactory()
+
+        executor = ThreadPoolExecutor(max_workers=1)
+        patcher = patch('recipe.async_views.executor', executor)
+        patcher.start()
+        self.addCleanup(executor.shutdown)
+        self.addCleanup(
+            lambda: executor.submit(connections.close_all).result())
+        self.addCleanup(patcher.stop)
+
+    def get(self, view, url):
+        request = self.factory.get(
+            url, HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        return async_to_sync(view)(request)
+
+    def test_sync_by_default(self):
+        """Test the views stay sync unless API_ASYNC_VIEWS is set"""
+        view = RecipeViewSet.as_view({'get': 'list'})
+        self.assertFalse(asyncio.iscoroutinefunction(view))
+
+    @override_settings(API_ASYNC_VIEWS=True)
+    def test_list_recipes(self):
+        """Test the recipe list is rendered on a pool thread"""
+        Recipe.objects.create(
+            user=self.user, title='steak', time_minutes=10, price='5.00')
+        view = RecipeViewSet.as_view({'get': 'list'})
+        self.assertTrue(asyncio.iscoroutinefunction(view))
+
+        threads = []
+        original = async_views.run_view
+
+        def run_view(*args):
+            threads.append(threading.current_thread())
+            return original(*args)
+
+        with patch('recipe.async_views.run_view', side_effect=run_view):
+            res = self.get(view, RECIPE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.is_rendered)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertNotEqual(threads, [threading.current_thread()])
+
+    @override_settings(API_ASYNC_VIEWS=True)
+    def test_tags_require_authentication(self):
+        """Test authentication still applies to the async views"""
+        Tag.objects.create(user=self.user, name='vegan')
+        view = TagViewSet.as_view({'get': 'list'})
+        res = async_to_sync(view)(self.factory.get(TAG_URL))
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -0,0 +1,148 @@
+from unittest.mock import patch
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.utils.http import http_date
+from rest_framework import status
+from core.models import Recipe, Tag
+from core.testcases import AuthenticatedTestCase
+from recipe.cache import cache_stats, invalidate_user
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAG_URL = reverse('recipe:tag-list')
+
+
+def sample_recipe(user, **params):
+    """Creates a sample recipe"""
+    default = {
+        'title': 'steak burger',
+        'time_minutes': '10',
+        'price': '5.00'
+    }
+    default.update(params)
+    return Recipe.objects.create(user=user, **default)
+
+
+class ListCacheTest(AuthenticatedTestCase):
+    """Test the per user cache of the list endpoints"""
+
+    def test_repeated_list_is_cached(self):
+        """Test the second request is served without queries"""
+        sample_recipe(self.user)
+        self.client.get(RECIPE_URL)
+        hits = cache_stats()['hits']
+
+        with self.assertNumQueries(0):
+            res = self.client.get(RECIPE_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(cache_stats()['hits'], hits + 1)
+
+    def test_query_parameters_are_cached_apart(self):
+        """Test different query parameters get their own entry"""
+        sample_recipe(self.user, title='a')
+        sample_recipe(self.user, title='b')
+        self.client.get(RECIPE_URL)
+        res = self.client.get(RECIPE_URL, {'page_size': 1})
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_create_invalidates(self):
+        """Test creating a recipe invalidates the cached list"""
+        self.client.get(RECIPE_URL)
+        with self.captureOnCommitCallbacks(execute=True):
+            sample_recipe(self.user)
+        res = self.client.get(RECIPE_URL)
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_invalidated_on_commit(self):
+        """Test the cached list is kept until the write commits"""
+        self.client.get(RECIPE_URL)
+        with self.captureOnCommitCallbacks() as callbacks:
+            sample_recipe(self.user)
+        res = self.client.get(RECIPE_URL)
+        self.assertEqual(res.data['results'], [])
+
+        for callback in callbacks:
+            callback()
+        res = self.client.get(RECIPE_URL)
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_relation_change_invalidates(self):
+        """Test adding a tag to a recipe invalidates the cached list"""
+        recipe = sample_recipe(self.user)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.client.get(RECIPE_URL)
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.tags.add(tag)
+        res = self.client.get(RECIPE_URL)
+        self.assertEqual(res.data['results'][0]['tags'], [tag.id])
+
+    def test_users_are_cached_apart(self):
+        """Test a cached list is never served to another user"""
+        Tag.objects.create(user=self.user, name='Vegan')
+        self.client.get(TAG_URL)
+        imposter = get_user_model().objects.create_user(
+            email='imposter@killer.com', password='im_an_imposter')
+        self.client.force_authenticate(imposter)
+        res = self.client.get(TAG_URL)
+        self.assertEqual(res.data['results'], [])
+
+    def test_if_none_match_not_modified(self):
+        """Test a matching ETag is answered with 304 and no queries"""
+        res = self.client.get(TAG_URL)
+        etag = res['ETag']
+        with self.assertNumQueries(0):
+            res = self.client.get(TAG_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(user=self.user, name='Vegan')
+        res = self.client.get(TAG_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+
+    def at(self, seconds):
+        return patch('recipe.cache.time.time', return_value=seconds)
+
+    def test_if_modified_since_not_modified(self):
+        """Test polling with Last-Modified is answered with 304"""
+        with self.at(1e9):
+            invalidate_user(self.user.pk)
+        res = self.client.get(TAG_URL)
+        last_modified = res['Last-Modified']
+        self.assertEqual(last_modified, http_date(1e9))
+        with self.assertNumQueries(0):
+            res = self.client.get(
+                TAG_URL, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_if_modified_since_after_write(self):
+        """Test a write moves Last-Modified past an older poll"""
+        with self.at(1e9):
+            invalidate_user(self.user.pk)
+        with self.at(1e9 + 5):
+            last_modified = self.client.get(TAG_URL)['Last-Modified']
+        with self.at(1e9 + 5.5), \
+                self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(user=self.user, name='Vegan')
+        with self.at(1e9 + 7):
+            res = self.client.get(
+                TAG_URL, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Last-Modified'], http_date(1e9 + 5))
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_write_in_the_same_second_is_not_hidden(self):
+        """Test Last-Modified is withheld until the second of a write ends"""
+        with self.at(1e9 + 0.2):
+            invalidate_user(self.user.pk)
+        with self.at(1e9 + 0.3):
+            res = self.client.get(TAG_URL)
+        self.assertNotIn('Last-Modified', res)
+
+        with self.at(1e9 + 0.9):
+            with self.captureOnCommitCallbacks(execute=True):
+                Tag.objects.create(user=self.user, name='Vegan')
+            res = self.client.get(
+                TAG_URL, HTTP_IF_MODIFIED_SINCE=http_date(1e9))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 1)
@@ -3,7 +3,8 @@ from django.urls import reverse
 from django.test import TestCase
 from rest_framework import status
 from rest_framework.test import APIClient
-from core.models import Ingredient
+from core.models import Ingredient, Recipe
+from core.testcases import AuthenticatedTestCase
 from recipe.serializers import IngredientSerializer
 
 INGREDIENT_URL = reverse('recipe:ingredient-list')
@@ -22,16 +23,9 @@ class PublicIngredientApiTest(TestCase):
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
-class PrivateIngredientApiTest(TestCase):
+class PrivateIngredientApiTest(AuthenticatedTestCase):
     """Test ingredients can be used by authorized user"""
 
-    def setUp(self):
-        self.user = get_user_model().objects.create_user(
-            email='helo@world.com', password='testpass')
-
-        self.client = APIClient()
-        self.client.force_authenticate(self.user)
-
     def test_retrieve_ingredient_list(self):
         """Test retriving a list of ingredient"""
 
@@ -42,7 +36,7 @@ class PrivateIngredientApiTest(TestCase):
         serializer = IngredientSerializer(ingredient, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_ingredient_limited_to_user(self):
         """test that ingredients for authenticated user are returned"""
@@ -53,8 +47,8 @@ class PrivateIngredientApiTest(TestCase):
         ingredient = Ingredient.objects.create(user=self.user, name="Salt")
         res = self.client.get(INGREDIENT_URL)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]['name'], ingredient.name)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['name'], ingredient.name)
 
     def test_create_ingredient_successfull(self):
         """Test creating new Ingredient"""
@@ -69,3 +63,30 @@ class PrivateIngredientApiTest(TestCase):
         payload = {'name': ''}
         res = self.client.post(INGREDIENT_URL, payload)
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_retrieve_ingredients_assigned_only(self):
+        """Test filtering ingredients by those assigned to recipes"""
+        assigned = Ingredient.objects.create(user=self.user, name='Eggs')
+        Ingredient.objects.create(user=self.user, name='Flour')
+        for title in ['Eggs benedict', 'Omelette']:
+            recipe = Recipe.objects.create(
+                user=self.user, title=title, time_minutes=5, price=10.00)
+            recipe.ingredients.add(assigned)
+
+        res = self.client.get(INGREDIENT_URL, {'assigned_only': 1})
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['name'], assigned.name)
+
+    def test_retrieve_assigned_ingredients_with_counts(self):
+        """Test counting combines with filtering assigned ingredients"""
+        eggs = Ingredient.objects.create(user=self.user, name='Eggs')
+        Ingredient.objects.create(user=self.user, name='Flour')
+        for title in ['Eggs benedict', 'Omelette']:
+            recipe = Recipe.objects.create(
+                user=self.user, title=title, time_minutes=5, price=10.00)
+            recipe.ingredients.add(eggs)
+
+        res = self.client.get(
+            INGREDIENT_URL, {'assigned_only': 1, 'with_counts': 1})
+        self.assertEqual(res.data['results'],
+                         [{'id': eggs.id, 'name': 'Eggs', 'recipe_count': 2}])
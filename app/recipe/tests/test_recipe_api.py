@@ -1,12 +1,25 @@
 from django.contrib.auth import get_user_model
 from django.urls import reverse
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+from unittest import skipUnless
+from unittest.mock import patch
+from PIL import Image
+from django.db import connection
+from django.db.models import FloatField
+from django.db.models.functions import Cast
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
-from rest_framework.test import APIClient
+from rest_framework.test import APIClient, APIRequestFactory
 from core.models import Recipe, Tag, Ingredient
+from core.testcases import AuthenticatedTestCase
+from recipe.images import release_image
 from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
 
 RECIPE_URL = reverse('recipe:recipe-list')
+BULK_URL = reverse('recipe:recipe-bulk')
 
 
 def sample_recipe(user, **params):
@@ -25,6 +38,11 @@ def detail_url(id):
     return reverse('recipe:recipe-detail', args=[id])
 
 
+def image_upload_url(id):
+    """Returns the image upload url of a recipe"""
+    return reverse('recipe:recipe-upload-image', args=[id])
+
+
 def sample_tag(user, name="Main course"):
     return Tag.objects.create(user=user, name=name)
 
@@ -46,26 +64,19 @@ class PublicRecipeApiTest(TestCase):
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
-class PrivateRecipeApiTest(TestCase):
+class PrivateRecipeApiTest(AuthenticatedTestCase):
     """Test Recipe cannot be used by authorized user"""
 
-    def setUp(self):
-        self.user = get_user_model().objects.create_user(
-            email='helo@world.com', password='testpass')
-
-        self.client = APIClient()
-        self.client.force_authenticate(self.user)
-
     def test_retrieve_recipe_list(self):
         """Test retriving a list of Recipe"""
 
         sample_recipe(self.user)
         sample_recipe(self.user)
         res = self.client.get(RECIPE_URL)
-        recipe = Recipe.objects.all()
+        recipe = Recipe.objects.all().order_by('id')
         serializer = RecipeSerializer(recipe, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_retrieve_recipe_limited_user(self):
         """Test retriving a list of Recipe for users"""
@@ -78,8 +89,8 @@ class PrivateRecipeApiTest(TestCase):
         recipe = Recipe.objects.filter(user=self.user)
         serializer = RecipeSerializer(recipe, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
-        self.assertEqual(len(res.data), 1)
+        self.assertEqual(res.data['results'], serializer.data)
+        self.assertEqual(len(res.data['results']), 1)
 
     def test_view_recipe_detail(self):
 
@@ -143,3 +154,648 @@ class PrivateRecipeApiTest(TestCase):
         self.assertIn(ingredient1,ingredient)
         self.assertIn(ingredient2,ingredient)
     
+
+class RecipeQueryCountTest(AuthenticatedTestCase):
+    """Test that the number of queries does not grow with the recipes"""
+
+    def create_recipes(self, count):
+        tag = sample_tag(user=self.user)
+        ingredient = sample_ingredient(user=self.user)
+        recipes = []
+        for i in range(count):
+            recipe = sample_recipe(user=self.user, title=f'recipe {i}')
+            recipe.tags.add(tag)
+            recipe.ingredients.add(ingredient)
+            recipes.append(recipe)
+        return recipes
+
+    def test_list_query_count_is_constant(self):
+        """Test listing recipes uses a fixed number of queries"""
+        self.create_recipes(1)
+        with self.assertNumQueries(3):
+            self.client.get(RECIPE_URL)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_recipes(5)
+        with self.assertNumQueries(3):
+            res = self.client.get(RECIPE_URL)
+        self.assertEqual(len(res.data['results']), 6)
+        self.assertEqual(len(res.data['results'][0]['tags']), 1)
+        self.assertEqual(len(res.data['results'][0]['ingredients']), 1)
+
+    def test_retrieve_query_count_is_constant(self):
+        """Test retrieving a recipe prefetches tags and ingredients"""
+        recipe = self.create_recipes(1)[0]
+        recipe.tags.add(sample_tag(user=self.user, name='Vegan'))
+        recipe.ingredients.add(sample_ingredient(user=self.user, name='salt'))
+        with self.assertNumQueries(3):
+            res = self.client.get(detail_url(recipe.id))
+        self.assertEqual(res.data, RecipeDetailSerializer(recipe).data)
+
+
+class RecipeSparseFieldsTest(AuthenticatedTestCase):
+    """Test the ?fields= and ?expand= parameters"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.recipe = sample_recipe(user=cls.user, title='Pancakes')
+        cls.tag = sample_tag(user=cls.user)
+        cls.recipe.tags.add(cls.tag)
+
+    def test_list_selected_fields(self):
+        """Test only the selected columns are loaded and returned"""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(
+                RECIPE_URL, {'fields': 'id,title,time_minutes'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'], [{
+            'id': self.recipe.id, 'title': 'Pancakes', 'time_minutes': 10,
+        }])
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('price', queries[0]['sql'])
+
+    def test_list_expand_tags(self):
+        """Test the expanded relation is nested and the others left out"""
+        with self.assertNumQueries(2):
+            res = self.client.get(
+                RECIPE_URL, {'fields': 'id,tags', 'expand': 'tags'})
+        self.assertEqual(res.data['results'], [{
+            'id': self.recipe.id,
+            'tags': [{'id': self.tag.id, 'name': self.tag.name}],
+        }])
+
+    def test_retrieve_without_expanding(self):
+        """Test the detail view lists ids when nothing is expanded"""
+        res = self.client.get(detail_url(self.recipe.id), {'expand': ''})
+        self.assertEqual(res.data['tags'], [self.tag.id])
+
+    def test_unknown_field(self):
+        """Test unknown fields are rejected"""
+        res = self.client.get(RECIPE_URL, {'fields': 'id,secret'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('secret', str(res.data['fields']))
+
+    def test_sorted_by_unselected_field(self):
+        """Test ordering by a field left out of the response"""
+        sample_recipe(user=self.user, title='Apple pie')
+        with self.assertNumQueries(1):
+            res = self.client.get(
+                RECIPE_URL, {'fields': 'id', 'ordering': 'title'})
+        self.assertEqual(res.data['results'][1], {'id': self.recipe.id})
+
+
+class RecipePaginationTest(AuthenticatedTestCase):
+    """Test the cursor pagination of the recipe list"""
+
+    def test_pages_follow_the_cursor(self):
+        """Test walking the pages returns every recipe once in id order"""
+        recipes = [sample_recipe(user=self.user, title=f'recipe {i}')
+                   for i in range(5)]
+        res = self.client.get(RECIPE_URL, {'page_size': 2})
+        ids = [item['id'] for item in res.data['results']]
+        while res.data['next']:
+            res = self.client.get(res.data['next'])
+            ids += [item['id'] for item in res.data['results']]
+
+        self.assertEqual(ids, [recipe.id for recipe in recipes])
+
+    def test_ordering_by_title(self):
+        """Test the recipes can be paginated by title"""
+        sample_recipe(user=self.user, title='b')
+        sample_recipe(user=self.user, title='a')
+        res = self.client.get(RECIPE_URL, {'ordering': 'title'})
+        titles = [item['title'] for item in res.data['results']]
+        self.assertEqual(titles, ['a', 'b'])
+
+    def test_ranked_pages_break_ties_by_id(self):
+        """Test ranked results are paged once each, newest first on ties"""
+        recipes = [sample_recipe(user=self.user, title=f'recipe {i}',
+                                 time_minutes=minutes)
+                   for i, minutes in enumerate([3, 1, 3, 2, 3, 1, 2, 3, 3])]
+
+        def rank_by_time(queryset, text):
+            return queryset.annotate(
+                rank=Cast('time_minutes', FloatField()))
+
+        with patch('recipe.filters.search_recipes', rank_by_time):
+            res = self.client.get(RECIPE_URL,
+                                  {'search': 'recipe', 'page_size': 2})
+            ids = [item['id'] for item in res.data['results']]
+            while res.data['next']:
+                res = self.client.get(res.data['next'])
+                ids += [item['id'] for item in res.data['results']]
+
+        expected = sorted(recipes,
+                          key=lambda recipe: (-recipe.time_minutes,
+                                              -recipe.id))
+        self.assertEqual(ids, [recipe.id for recipe in expected])
+
+    @override_settings(API_MAX_PAGE_SIZE=2)
+    def test_page_size_is_capped(self):
+        """Test the page size cannot exceed the configured ceiling"""
+        for i in range(3):
+            sample_recipe(user=self.user, title=f'recipe {i}')
+        res = self.client.get(RECIPE_URL, {'page_size': 100})
+        self.assertEqual(len(res.data['results']), 2)
+        self.assertIsNotNone(res.data['next'])
+
+
+class RecipeFilterTest(AuthenticatedTestCase):
+    """Test filtering recipes by tags and ingredients"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.vegan = sample_tag(user=cls.user, name='Vegan')
+        cls.dessert = sample_tag(user=cls.user, name='Dessert')
+        cls.salt = sample_ingredient(user=cls.user, name='salt')
+        cls.curry = sample_recipe(user=cls.user, title='curry')
+        cls.curry.tags.add(cls.vegan)
+        cls.curry.ingredients.add(cls.salt)
+        cls.cake = sample_recipe(user=cls.user, title='cake')
+        cls.cake.tags.add(cls.vegan, cls.dessert)
+        cls.steak = sample_recipe(user=cls.user, title='steak')
+
+    def titles(self, params):
+        res = self.client.get(RECIPE_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [recipe['title'] for recipe in res.data['results']]
+
+    def test_filter_by_any_tag(self):
+        """Test recipes with any of the tags are returned once"""
+        titles = self.titles({'tags': f'{self.vegan.id},{self.dessert.id}'})
+        self.assertEqual(titles, ['curry', 'cake'])
+
+    def test_filter_by_all_tags(self):
+        """Test only recipes with all the tags are returned"""
+        titles = self.titles({
+            'tags': f'{self.vegan.id},{self.dessert.id}', 'match': 'all'})
+        self.assertEqual(titles, ['cake'])
+
+    def test_filter_by_tags_and_ingredients(self):
+        """Test tag and ingredient filters are combined"""
+        titles = self.titles({
+            'tags': f'{self.vegan.id}', 'ingredients': f'{self.salt.id}'})
+        self.assertEqual(titles, ['curry'])
+
+    def test_filter_invalid_ids(self):
+        """Test non numeric ids are rejected"""
+        res = self.client.get(RECIPE_URL, {'tags': 'vegan'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_filter_out_of_range_ids(self):
+        """Test ids the database cannot hold are rejected"""
+        for value in ('99999999999999999999', f'{self.vegan.id},{2 ** 63}'):
+            res = self.client.get(RECIPE_URL, {'tags': value})
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RecipeSearchTest(AuthenticatedTestCase):
+    """Test searching recipes by title, tags and ingredients"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.curry = sample_recipe(user=cls.user, title='Chickpea curry')
+        cls.curry.ingredients.add(sample_ingredient(cls.user, 'Coconut'))
+        cls.cake = sample_recipe(user=cls.user, title='Carrot cake')
+        cls.cake.tags.add(sample_tag(cls.user, 'Coconut dessert'))
+        sample_recipe(user=cls.user, title='Steak')
+
+    def titles(self, text):
+        res = self.client.get(RECIPE_URL, {'search': text})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return {recipe['title'] for recipe in res.data['results']}
+
+    def test_search_by_title(self):
+        """Test recipes are found by title"""
+        self.assertEqual(self.titles('curry'), {'Chickpea curry'})
+
+    def test_search_by_related_names(self):
+        """Test recipes are found by tag and ingredient names"""
+        self.assertEqual(self.titles('coconut'),
+                         {'Chickpea curry', 'Carrot cake'})
+
+    def test_search_other_users_hidden(self):
+        """Test the search is limited to the user's recipes"""
+        imposter = get_user_model().objects.create_user(
+            email='imposter@killer.com', password='im_an_imposter')
+        sample_recipe(user=imposter, title='Imposter curry')
+        self.assertEqual(self.titles('curry'), {'Chickpea curry'})
+
+    @skipUnless(connection.vendor == 'postgresql', 'Requires PostgreSQL')
+    def test_search_ranks_title_first(self):
+        """Test title matches rank above tag and ingredient matches"""
+        sample_recipe(user=self.user, title='Coconut rice')
+        res = self.client.get(RECIPE_URL, {'search': 'coconut'})
+        self.assertEqual(res.data['results'][0]['title'], 'Coconut rice')
+
+    @skipUnless(connection.vendor == 'postgresql', 'Requires PostgreSQL')
+    def test_search_vector_follows_renames(self):
+        """Test renaming a tag updates the recipes using it"""
+        tag = self.cake.tags.get()
+        tag.name = 'Brunch'
+        tag.save()
+        self.assertEqual(self.titles('brunch'), {'Carrot cake'})
+        self.assertEqual(self.titles('dessert'), set())
+
+
+class RecipeUpdateTest(AuthenticatedTestCase):
+    """Test updating recipes and their tags and ingredients"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.vegan = sample_tag(user=cls.user, name='Vegan')
+        cls.dessert = sample_tag(user=cls.user, name='Dessert')
+        cls.spicy = sample_tag(user=cls.user, name='Spicy')
+        cls.salt = sample_ingredient(user=cls.user, name='salt')
+        cls.recipe = sample_recipe(user=cls.user)
+        cls.recipe.tags.add(cls.vegan, cls.dessert)
+
+    def tag_rows(self):
+        return dict(Recipe.tags.through.objects.filter(
+            recipe=self.recipe).values_list('tag_id', 'pk'))
+
+    def test_partial_update_diffs_relations(self):
+        """Test only the through rows that changed are written"""
+        kept = self.tag_rows()[self.dessert.id]
+        res = self.client.patch(
+            detail_url(self.recipe.id),
+            {'tags': [self.dessert.id, self.spicy.id]}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(sorted(res.data['tags']),
+                         [self.dessert.id, self.spicy.id])
+        rows = self.tag_rows()
+        self.assertEqual(set(rows), {self.dessert.id, self.spicy.id})
+        self.assertEqual(rows[self.dessert.id], kept)
+
+    def test_full_update(self):
+        """Test a PUT replaces the fields and relations of the recipe"""
+        payload = {'title': 'Curry', 'time_minutes': 30, 'price': '7.50',
+                   'tags': [], 'ingredients': [self.salt.id]}
+        res = self.client.put(
+            detail_url(self.recipe.id), payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.title, 'Curry')
+        self.assertFalse(self.recipe.tags.exists())
+        self.assertEqual(list(self.recipe.ingredients.all()), [self.salt])
+
+    def test_update_refreshes_cached_list(self):
+        """Test a relation change is visible in the cached list"""
+        self.client.get(RECIPE_URL)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(detail_url(self.recipe.id),
+                              {'tags': [self.spicy.id]}, format='json')
+        res = self.client.get(RECIPE_URL)
+        self.assertEqual(res.data['results'][0]['tags'], [self.spicy.id])
+
+    def test_foreign_tags_rejected(self):
+        """Test tags of another user cannot be assigned"""
+        imposter = get_user_model().objects.create_user(
+            email='imposter@killer.com', password='im_an_imposter')
+        foreign = sample_tag(user=imposter, name='Foreign')
+        res = self.client.patch(detail_url(self.recipe.id),
+                                {'tags': [foreign.id]}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('tags', res.data)
+        self.assertEqual(set(self.tag_rows()),
+                         {self.vegan.id, self.dessert.id})
+
+    def test_relations_validated_in_one_query(self):
+        """Test the ids of each relation are checked in a single query"""
+        request = APIRequestFactory().post(RECIPE_URL)
+        request.user = self.user
+        payload = {'title': 'Curry', 'time_minutes': 30, 'price': '7.50',
+                   'tags': [self.vegan.id, self.dessert.id, self.spicy.id],
+                   'ingredients': [self.salt.id, 0]}
+        serializer = RecipeSerializer(
+            data=payload, context={'request': request})
+        with self.assertNumQueries(2):
+            self.assertFalse(serializer.is_valid())
+        self.assertEqual(serializer.errors['ingredients'],
+                         ['Invalid pk "0" - object does not exist.'])
+
+
+class RecipeBulkApiTest(AuthenticatedTestCase):
+    """Test creating, updating and deleting recipes in bulk"""
+
+    def test_bulk_create(self):
+        """Test creating recipes with tags and ingredients in one request"""
+        tag = sample_tag(user=self.user)
+        ingredient = sample_ingredient(user=self.user)
+        payload = [
+            {'title': 'curry', 'time_minutes': 30, 'price': '7.00',
+             'tags': [tag.id], 'ingredients': [ingredient.id]},
+            {'title': 'salad', 'time_minutes': 5, 'price': '3.50',
+             'tags': [], 'ingredients': []},
+        ]
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([item['title'] for item in res.data],
+                         ['curry', 'salad'])
+        curry = Recipe.objects.get(user=self.user, title='curry')
+        self.assertEqual(list(curry.tags.all()), [tag])
+        self.assertEqual(list(curry.ingredients.all()), [ingredient])
+        self.assertEqual(res.data[0], RecipeSerializer(curry).data)
+
+    def test_bulk_create_requires_relations(self):
+        """Test bulk items need the same fields as a single create"""
+        payload = [{'title': 'curry', 'time_minutes': 30, 'price': '7.00'}]
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(set(res.data[0]), {'tags', 'ingredients'})
+        single = self.client.post(RECIPE_URL, payload[0], format='json')
+        self.assertEqual(set(single.data), {'tags', 'ingredients'})
+
+    def test_bulk_create_queries(self):
+        """Test the recipes are inserted with one query, not one each"""
+        payload = [{'title': f'recipe {i}', 'time_minutes': i,
+                    'price': '5.00', 'tags': [], 'ingredients': []}
+                   for i in range(10)]
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        inserts = [query for query in queries.captured_queries
+                   if query['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 1)
+        recipes = Recipe.objects.filter(user=self.user).order_by('id')
+        self.assertEqual([item['id'] for item in res.data],
+                         [recipe.id for recipe in recipes])
+        self.assertEqual([item['title'] for item in res.data],
+                         [recipe.title for recipe in recipes])
+
+    def test_bulk_create_reports_item_errors(self):
+        """Test invalid items are reported by position and nothing saved"""
+        imposter = get_user_model().objects.create_user(
+            email='imposter@killer.com', password='im_an_imposter')
+        foreign_tag = sample_tag(user=imposter)
+        payload = [
+            {'title': 'curry', 'time_minutes': 30, 'price': '7.00',
+             'tags': [], 'ingredients': []},
+            {'title': 'salad', 'time_minutes': 5, 'price': '3.50',
+             'tags': [foreign_tag.id], 'ingredients': []},
+            {'title': '', 'time_minutes': 5, 'price': '3.50',
+             'tags': [], 'ingredients': []},
+        ]
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})
+        self.assertIn('title', res.data[2])
+        self.assertFalse(Recipe.objects.exists())
+
+        del payload[2]
+        res = self.client.post(BULK_URL, payload, format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})
+        self.assertIn('tags', res.data[1])
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_bulk_update(self):
+        """Test patching the fields and tags of several recipes"""
+        vegan = sample_tag(user=self.user, name='Vegan')
+        dessert = sample_tag(user=self.user, name='Dessert')
+        cake = sample_recipe(user=self.user, title='cake')
+        cake.tags.add(vegan)
+        curry = sample_recipe(user=self.user, title='curry')
+        payload = [
+            {'id': cake.id, 'tags': [dessert.id]},
+            {'id': curry.id, 'title': 'red curry'},
+        ]
+        res = self.client.patch(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(cake.tags.all()), [dessert])
+        curry.refresh_from_db()
+        self.assertEqual(curry.title, 'red curry')
+
+    def test_bulk_update_other_users_recipe(self):
+        """Test recipes of other users cannot be updated"""
+        imposter = get_user_model().objects.create_user(
+            email='imposter@killer.com', password='im_an_imposter')
+        recipe = sample_recipe(user=imposter)
+        res = self.client.patch(
+            BULK_URL, [{'id': recipe.id, 'title': 'hacked'}], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('id', res.data[0])
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'steak burger')
+
+    def test_bulk_boolean_ids_rejected(self):
+        """Test JSON booleans are not taken for the ids 0 and 1"""
+        recipe = sample_recipe(user=self.user, id=1)
+        res = self.client.patch(
+            BULK_URL, [{'id': True, 'title': 'renamed'}], format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('id', res.data[0])
+
+        res = self.client.delete(BULK_URL, {'ids': [True]}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'steak burger')
+
+    def test_bulk_delete(self):
+        """Test deleting several recipes of the user"""
+        imposter = get_user_model().objects.create_user(
+            email='imposter@killer.com', password='im_an_imposter')
+        recipes = [sample_recipe(user=self.user) for _ in range(2)]
+        foreign = sample_recipe(user=imposter)
+        ids = [recipe.id for recipe in recipes] + [foreign.id]
+        res = self.client.delete(BULK_URL, {'ids': ids}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Recipe.objects.filter(user=self.user).exists())
+        self.assertTrue(Recipe.objects.filter(id=foreign.id).exists())
+
+
+@override_settings(RECIPE_IMAGE_WORKERS=0)
+class RecipeImageUploadTest(AuthenticatedTestCase):
+    """Test uploading and processing recipe images"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.recipe = sample_recipe(user=cls.user)
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root)
+
+        super().setUp()
+
+    def upload(self, size=(2000, 1000), color='red', recipe=None,
+               suffix='.jpg', icc_profile=None):
+        recipe = recipe or self.recipe
+        with tempfile.NamedTemporaryFile(suffix=suffix) as image_file:
+            image = Image.new('RGB', size, color=color)
+            exif = Image.Exif()
+            exif[0x010f] = 'Camera maker'
+            image.save(image_file, format='JPEG', exif=exif,
+                       icc_profile=icc_profile)
+            image_file.seek(0)
+            with self.captureOnCommitCallbacks(execute=True):
+                return self.client.post(
+                    image_upload_url(recipe.id),
+                    {'image': image_file}, format='multipart')
+
+    def test_upload_image_is_accepted(self):
+        """Test uploading an image returns before it is processed"""
+        res = self.upload()
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(res.data['image_status'], Recipe.IMAGE_PENDING)
+        self.recipe.refresh_from_db()
+        self.assertTrue(os.path.exists(self.recipe.image.path))
+
+    def test_renditions_are_resized_without_exif(self):
+        """Test the renditions fit their sizes and carry no metadata"""
+        self.upload()
+        res = self.client.get(image_upload_url(self.recipe.id))
+        self.assertEqual(res.data['image_status'], Recipe.IMAGE_READY)
+        self.assertEqual(set(res.data['renditions']),
+                         {'thumbnail', 'medium', 'large'})
+
+        self.recipe.refresh_from_db()
+        path = os.path.join(
+            self.media_root, self.recipe.image_renditions['thumbnail'])
+        with Image.open(path) as thumbnail:
+            self.assertEqual(thumbnail.size, (160, 80))
+            self.assertEqual(len(thumbnail.getexif()), 0)
+
+    def test_upload_image_bad_request(self):
+        """Test uploading an invalid image"""
+        res = self.client.post(image_upload_url(self.recipe.id),
+                               {'image': 'notimage'}, format='multipart')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def uploaded_files(self):
+        return [name for _, _, names in os.walk(self.media_root)
+                for name in names]
+
+    def test_upload_corrupt_image_rejected(self):
+        """Test a file that is not an image is rejected and removed"""
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+            image_file.write(b'not an image' * 100)
+            image_file.seek(0)
+            res = self.client.post(image_upload_url(self.recipe.id),
+                                   {'image': image_file}, format='multipart')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.uploaded_files(), [])
+
+    def test_upload_image_with_large_header_accepted(self):
+        """Test metadata over the first chunks does not hide the header"""
+        res = self.upload(size=(200, 100), icc_profile=os.urandom(150000))
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.recipe.refresh_from_db()
+        self.assertGreater(self.recipe.image.size, 150000)
+
+    @override_settings(RECIPE_IMAGE_MAX_PIXELS=1000 * 1000)
+    def test_large_header_checked_against_pixel_limit(self):
+        """Test an image with a large header is still held to the limit"""
+        res = self.upload(icc_profile=os.urandom(150000))
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('pixels', res.data['image'][0])
+        self.assertEqual(self.uploaded_files(), [])
+
+    def test_same_image_stored_once(self):
+        """Test the same image uploaded to two recipes is stored once"""
+        other = sample_recipe(user=self.user, title='other')
+        self.upload()
+        self.upload(recipe=other)
+
+        self.recipe.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(self.recipe.image.name, other.image.name)
+        self.assertEqual(other.image_status, Recipe.IMAGE_READY)
+        self.assertEqual(len(self.uploaded_files()), 4)
+
+    def test_same_image_with_other_extension_stored_once(self):
+        """Test the stored name follows the image format, not the file name"""
+        other = sample_recipe(user=self.user, title='other')
+        self.upload(suffix='.jpeg')
+        self.upload(recipe=other, suffix='.JPG')
+        self.assertEqual(len(self.uploaded_files()), 4)
+
+        self.recipe.refresh_from_db()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.delete()
+        other.refresh_from_db()
+        self.assertTrue(other.image.name.endswith('.jpg'))
+        self.assertTrue(os.path.exists(other.image.path))
+        for path in other.image_renditions.values():
+            self.assertTrue(
+                os.path.exists(os.path.join(self.media_root, path)))
+
+    def test_unreferenced_image_is_removed(self):
+        """Test an image is deleted with the last recipe using it"""
+        other = sample_recipe(user=self.user, title='other')
+        self.upload()
+        self.upload(recipe=other)
+        self.upload(color='blue')
+        self.assertEqual(len(self.uploaded_files()), 8)
+
+        other.refresh_from_db()
+        with self.captureOnCommitCallbacks(execute=True):
+            other.delete()
+        self.assertEqual(len(self.uploaded_files()), 4)
+        self.recipe.refresh_from_db()
+        self.assertTrue(os.path.exists(self.recipe.image.path))
+
+    def test_release_rechecks_references_under_lock(self):
+        """Test a reference committed while a release waits keeps the file"""
+        other = sample_recipe(user=self.user, title='other')
+        self.upload()
+        self.recipe.refresh_from_db()
+        name = self.recipe.image.name
+        Recipe.objects.filter(pk=self.recipe.pk).update(image='')
+
+        def upload_commits(image_name):
+            Recipe.objects.filter(pk=other.pk).update(image=image_name)
+
+        with patch('recipe.images.lock_image', side_effect=upload_commits):
+            release_image(name)
+        self.assertTrue(os.path.exists(self.recipe.image.path))
+
+    def test_upload_stores_image_released_before_lock(self):
+        """Test an upload of a file deleted before its lock stores it again"""
+        other = sample_recipe(user=self.user, title='other')
+        self.upload()
+        Recipe.objects.filter(pk=self.recipe.pk).update(image='')
+
+        with patch('recipe.views.lock_image', side_effect=release_image):
+            res = self.upload(recipe=other)
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        other.refresh_from_db()
+        self.assertTrue(os.path.exists(other.image.path))
+        self.assertEqual(other.image_status, Recipe.IMAGE_READY)
+
+    @override_settings(RECIPE_IMAGE_MAX_BYTES=1024)
+    def test_upload_too_large_rejected(self):
+        """Test an upload over the byte limit is refused while streaming"""
+        res = self.upload()
+        self.assertEqual(res.status_code,
+                         status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self.assertEqual(self.uploaded_files(), [])
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image)
+
+    @override_settings(RECIPE_IMAGE_MAX_PIXELS=1000 * 1000)
+    def test_upload_too_many_pixels_rejected(self):
+        """Test an image over the pixel limit is refused from its header"""
+        res = self.upload()
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('pixels', res.data['image'][0])
+        self.assertEqual(self.uploaded_files(), [])
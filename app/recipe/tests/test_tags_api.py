@@ -3,11 +3,13 @@ from django.urls import reverse
 from django.test import TestCase
 from rest_framework import status
 from rest_framework.test import APIClient
-from core.models import Tag
+from core.models import Tag, Recipe
+from core.testcases import AuthenticatedTestCase
 from recipe.serializers import TagSerializer
 
 
 TAG_URL = reverse('recipe:tag-list')
+TAG_BULK_URL = reverse('recipe:tag-bulk')
 
 
 class PublicTagsApiTest(TestCase):
@@ -22,16 +24,9 @@ class PublicTagsApiTest(TestCase):
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
-class PrivateTagsApiTest(TestCase):
+class PrivateTagsApiTest(AuthenticatedTestCase):
     """Handels the authorized users for tags api"""
 
-    def setUp(self):
-        self.user = get_user_model().objects.create_user(
-            email='helo@world.com', password='testpass')
-
-        self.client = APIClient()
-        self.client.force_authenticate(self.user)
-
     def test_retrieve_tags(self):
         """Test retriving tags"""
         Tag.objects.create(user=self.user, name='Vegan')
@@ -41,7 +36,7 @@ class PrivateTagsApiTest(TestCase):
         tags = Tag.objects.all().order_by('-name')
         serializer = TagSerializer(tags, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_tags_limited_to_user(self):
         """test the tags are returned to authenticated users"""
@@ -51,8 +46,8 @@ class PrivateTagsApiTest(TestCase):
         tag = Tag.objects.create(user=self.user, name='fruit')
         res = self.client.get(TAG_URL)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]['name'], tag.name)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['name'], tag.name)
 
     def test_create_tags_successfull(self):
         """Test creating new Tag"""
@@ -67,4 +62,62 @@ class PrivateTagsApiTest(TestCase):
         res = self.client.post(TAG_URL,payload)
         self.assertEqual(res.status_code,status.HTTP_400_BAD_REQUEST)
 
+    def test_tags_paginated_by_name(self):
+        """Test the tags are paginated in descending name order"""
+        for name in ['Vegan', 'Dessert', 'Breakfast']:
+            Tag.objects.create(user=self.user, name=name)
+
+        res = self.client.get(TAG_URL, {'page_size': 2})
+        names = [tag['name'] for tag in res.data['results']]
+        res = self.client.get(res.data['next'])
+        names += [tag['name'] for tag in res.data['results']]
+        self.assertEqual(names, ['Vegan', 'Dessert', 'Breakfast'])
+        self.assertIsNone(res.data['next'])
+
+    def test_retrieve_tags_assigned_only(self):
+        """Test filtering tags by those assigned to recipes"""
+        assigned = Tag.objects.create(user=self.user, name='Breakfast')
+        Tag.objects.create(user=self.user, name='Lunch')
+        for title in ['Eggs benedict', 'Omelette']:
+            recipe = Recipe.objects.create(
+                user=self.user, title=title, time_minutes=5, price=10.00)
+            recipe.tags.add(assigned)
+
+        res = self.client.get(TAG_URL, {'assigned_only': 1})
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['name'], assigned.name)
+
+    def test_retrieve_tags_with_counts(self):
+        """Test tags are counted by recipe in one query"""
+        breakfast = Tag.objects.create(user=self.user, name='Breakfast')
+        lunch = Tag.objects.create(user=self.user, name='Lunch')
+        Tag.objects.create(user=self.user, name='Dinner')
+        for title in ['Eggs benedict', 'Omelette']:
+            recipe = Recipe.objects.create(
+                user=self.user, title=title, time_minutes=5, price=10.00)
+            recipe.tags.add(breakfast)
+        recipe.tags.add(lunch)
+
+        with self.assertNumQueries(1):
+            res = self.client.get(TAG_URL, {'with_counts': 1})
+        counts = {tag['name']: tag['recipe_count']
+                  for tag in res.data['results']}
+        self.assertEqual(counts, {'Breakfast': 2, 'Lunch': 1, 'Dinner': 0})
+
+    def test_retrieve_tags_without_counts(self):
+        """Test tags are not counted unless asked"""
+        Tag.objects.create(user=self.user, name='Breakfast')
+        res = self.client.get(TAG_URL)
+        self.assertNotIn('recipe_count', res.data['results'][0])
+
+    def test_bulk_create_and_rename_tags(self):
+        """Test tags can be created and renamed in bulk"""
+        payload = [{'name': 'Vegan'}, {'name': 'Dessert'}]
+        res = self.client.post(TAG_BULK_URL, payload, format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
 
+        payload = [{'id': res.data[0]['id'], 'name': 'Vegetarian'}]
+        res = self.client.patch(TAG_BULK_URL, payload, format='json')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(Tag.objects.filter(name='Vegetarian').exists())
@@ -0,0 +1,57 @@
+from django.test import override_settings
+from django.urls import reverse
+from core.models import Ingredient, Recipe, Tag
+from core.testcases import AuthenticatedTestCase
+from recipe.cache import invalidate_user
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAG_URL = reverse('recipe:tag-list')
+
+
+class ValuesListTest(AuthenticatedTestCase):
+    """Test the lists built from values() rows match the serializers"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        tags = [Tag.objects.create(user=cls.user, name=name)
+                for name in ('Vegan', 'Dessert\u2028', 'Crème')]
+        salt = Ingredient.objects.create(user=cls.user, name='salt')
+        for i in range(5):
+            recipe = Recipe.objects.create(
+                user=cls.user, title=f'Recipe «{i}»', time_minutes=i,
+                price='12.50', link='' if i % 2 else 'https://example.com')
+            recipe.tags.add(*reversed(tags[:i]))
+            if i % 2:
+                recipe.ingredients.add(salt)
+
+    def assertSameBody(self, url, params=None):
+        res = self.client.get(url, params)
+        invalidate_user(self.user.pk)
+        with override_settings(API_VALUES_LISTS=False):
+            expected = self.client.get(url, params)
+        self.assertEqual(res.status_code, expected.status_code)
+        self.assertEqual(res.content, expected.content)
+        return res
+
+    def test_recipes_match(self):
+        """Test the recipe list is byte for byte the serializer's"""
+        res = self.assertSameBody(RECIPE_URL)
+        self.assertEqual(len(res.data['results']), 5)
+
+    def test_recipes_paginated_and_sparse_match(self):
+        """Test pages and sparse fieldsets are built the same way"""
+        res = self.assertSameBody(
+            RECIPE_URL, {'fields': 'id,tags,price', 'ordering': '-title',
+                         'page_size': 2})
+        self.assertIsNotNone(res.data['next'])
+        self.assertSameBody(res.data['next'])
+
+    def test_tags_with_counts_match(self):
+        """Test the tag list with counts is byte for byte the serializer's"""
+        self.assertSameBody(TAG_URL, {'with_counts': 1})
+
+    def test_list_queries(self):
+        """Test the recipe list needs a query per relation"""
+        with self.assertNumQueries(3):
+            self.client.get(RECIPE_URL)
@@ -0,0 +1,165 @@
+import hashlib
+import io
+import os
+import uuid
+from django.conf import settings
+from django.core.files.base import File
+from django.core.files.uploadhandler import (
+    FileUploadHandler, SkipFile, StopFutureHandlers)
+from django.http import QueryDict
+from django.utils.datastructures import MultiValueDict
+from PIL import Image
+from core.models import image_content_path
+from core.storage import content_storage
+
+HEADER_BYTES = 64 * 1024
+MULTIPART_OVERHEAD = 64 * 1024
+IMAGE_FORMATS = {'JPEG', 'PNG', 'WEBP', 'GIF'}
+
+
+class UploadRejected(Exception):
+    """Raised when an upload is refused, with the HTTP status to use"""
+
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class StoredUpload(File):
+    """A file written by the handler, identified by its storage name
+
+    The file stays under temp_name until the view moves it to its content
+    name, under the lock of that name.
+    """
+
+    def __init__(self, name, size, temp_name):
+        super().__init__(None, name)
+        self.size = size
+        self.temp_name = temp_name
+
+
+class RecipeImageUploadHandler(FileUploadHandler):
+    """Streams the `image` field of a request into the media storage
+
+    Chunks are hashed while they are written to a temporary file in the
+    storage, which the view then moves to its content address; an upload
+    of a file already stored is dropped in favour of the existing one. The
+    size is checked against RECIPE_IMAGE_MAX_BYTES while streaming and
+    the dimensions against RECIPE_IMAGE_MAX_PIXELS as soon as the image
+    header has arrived, without decoding any pixels. The header is
+    buffered until it parses, however large its metadata segments, and
+    parsing is retried each time the buffer has doubled.
+    """
+    field_name = 'image'
+
+    def __init__(self, recipe, request=None):
+        super().__init__(request)
+        self.recipe = recipe
+        self.error = None
+        self.file = None
+        self.name = None
+        self.file_name = None
+        self.digest = hashlib.sha256()
+        self.header = b''
+        self.header_checked = False
+        self.header_retry = HEADER_BYTES
+        self.image_format = None
+
+    def handle_raw_input(self, input_data, META, content_length, boundary,
+                         encoding=None):
+        """Refuses requests announcing a body larger than allowed"""
+        if content_length > settings.RECIPE_IMAGE_MAX_BYTES + MULTIPART_OVERHEAD:
+            self.error = self.too_large()
+            return QueryDict(encoding=encoding), MultiValueDict()
+        return None
+
+    def new_file(self, field_name, file_name, content_type, content_length,
+                 charset=None, content_type_extra=None):
+        super().new_file(field_name, file_name, content_type, content_length,
+                         charset, content_type_extra)
+        if field_name != self.field_name:
+            raise SkipFile()
+        if content_length and content_length > settings.RECIPE_IMAGE_MAX_BYTES:
+            self.error = self.too_large()
+            raise SkipFile()
+
+        self.file_name = file_name
+        self.name = f'uploads/recipe/.{uuid.uuid4().hex}.upload'
+        path = content_storage.path(self.name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.file = open(path, 'wb')
+        raise StopFutureHandlers()
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > settings.RECIPE_IMAGE_MAX_BYTES:
+            self.reject(self.too_large())
+        self.file.write(raw_data)
+        self.digest.update(raw_data)
+        if not self.header_checked:
+            self.header += raw_data
+            if len(self.header) >= self.header_retry:
+                self.header_retry = 2 * len(self.header)
+                error = self.check_header(complete=False)
+                if error:
+                    self.reject(error)
+        return None
+
+    def file_complete(self, file_size):
+        if self.file is None:
+            return None
+        error = None if self.header_checked else self.check_header(True)
+        if error:
+            self.error = error
+            self.discard()
+            return None
+        self.file.close()
+        self.file = None
+        name = image_content_path(self.digest.hexdigest(), self.file_name,
+                                  self.image_format)
+        return StoredUpload(name, file_size, self.name)
+
+    def upload_interrupted(self):
+        self.discard()
+
+    def check_header(self, complete):
+        """Returns the error of the image once its header is readable
+
+        Image.open only parses the header; pixel data is never decoded.
+        """
+        try:
+            with Image.open(io.BytesIO(self.header)) as image:
+                image_format, (width, height) = image.format, image.size
+        except Exception:
+            if complete:
+                return UploadRejected(
+                    'Upload a valid image. The file you uploaded was either '
+                    'not an image or a corrupted image.', 400)
+            return None
+
+        self.header_checked = True
+        self.image_format = image_format
+        if image_format not in IMAGE_FORMATS:
+            return UploadRejected(
+                f'Unsupported image format {image_format}.', 400)
+        if width * height > settings.RECIPE_IMAGE_MAX_PIXELS:
+            return UploadRejected(
+                f'Image of {width}x{height} pixels exceeds the limit of '
+                f'{settings.RECIPE_IMAGE_MAX_PIXELS} pixels.', 400)
+        return None
+
+    def too_large(self):
+        return UploadRejected(
+            f'Image exceeds the limit of '
+            f'{settings.RECIPE_IMAGE_MAX_BYTES} bytes.', 413)
+
+    def reject(self, error):
+        """Discards the partial file and skips the rest of the upload"""
+        self.error = error
+        self.discard()
+        raise SkipFile()
+
+    def discard(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+            content_storage.delete(self.name)
@@ -0,0 +1,120 @@
+from collections import defaultdict
+from django.conf import settings
+from rest_framework import fields as drf_fields
+from rest_framework.relations import (
+    ManyRelatedField, PrimaryKeyRelatedField, RelatedField)
+from rest_framework.response import Response
+from rest_framework.serializers import BaseSerializer
+from core.metrics import timer
+
+# Fields whose representation of a database value is the value itself
+PASSTHROUGH_FIELDS = (
+    drf_fields.IntegerField, drf_fields.CharField, drf_fields.ReadOnlyField)
+
+
+class ValuesPlan:
+    """Builds the representation of a serializer from values() rows
+
+    Flat fields are read from the row, converted only when their
+    representation differs from the database value, like a Decimal
+    price, and lists of related ids are read from the through tables in
+    one query per relation. The output is the one of the serializer.
+    """
+
+    def __init__(self, model, fields, relations):
+        self.model = model
+        self.fields = fields
+        self.relations = relations
+
+    @classmethod
+    def build(cls, serializer):
+        """Returns the plan of the serializer, None if it needs instances"""
+        model = serializer.Meta.model
+        fields, relations = [], {}
+        for name, field in serializer.fields.items():
+            if '.' in field.source or field.source == '*':
+                return None
+            if isinstance(field, ManyRelatedField):
+                if not isinstance(field.child_relation, PrimaryKeyRelatedField):
+                    return None
+                relation = model._meta.get_field(field.source)
+                relations[name] = (relation.remote_field.through,
+                                   relation.m2m_column_name(),
+                                   relation.m2m_reverse_name())
+                fields.append((name, None, None))
+            elif isinstance(field, (BaseSerializer, RelatedField,
+                                    drf_fields.SerializerMethodField)):
+                return None
+            elif isinstance(field, PASSTHROUGH_FIELDS):
+                fields.append((name, field.source, None))
+            else:
+                fields.append((name, field.source, field.to_representation))
+        return cls(model, fields, relations)
+
+    def values(self, queryset, extra=()):
+        """Returns the rows of the queryset with the columns of the fields"""
+        columns = {self.model._meta.pk.attname}
+        columns.update(source for _, source, _ in self.fields if source)
+        columns.update(extra)
+        return queryset.prefetch_related(None).values(*columns)
+
+    def related_ids(self, name, pks):
+        """Returns {pk: [related ids]} of a relation, ordered by id"""
+        through, column, target = self.relations[name]
+        ids = defaultdict(list)
+        rows = through.objects.filter(**{f'{column}__in': pks}).order_by(
+            column, target).values_list(column, target)
+        for pk, related_id in rows:
+            ids[pk].append(related_id)
+        return ids
+
+    def represent(self, rows):
+        """Returns the serialized data of the rows"""
+        with timer('serialize'):
+            return self.build_items(rows)
+
+    def build_items(self, rows):
+        pk_name = self.model._meta.pk.attname
+        pks = [row[pk_name] for row in rows]
+        related = {name: self.related_ids(name, pks)
+                   for name in self.relations} if pks else {}
+
+        data = []
+        for row in rows:
+            item = {}
+            for name, source, convert in self.fields:
+                if source is None:
+                    item[name] = related[name].get(row[pk_name], [])
+                    continue
+                value = row[source]
+                if convert is not None and value is not None:
+                    value = convert(value)
+                item[name] = value
+            data.append(item)
+        return data
+
+
+class ValuesListMixin:
+    """Serves the list action from values() rows when API_VALUES_LISTS is on
+
+    Used with viewsets whose list serializer only has plain fields and
+    id lists; nested or computed fields fall back to the serializer.
+    """
+
+    def list(self, request, *args, **kwargs):
+        plan = settings.API_VALUES_LISTS and ValuesPlan.build(
+            self.get_serializer())
+        if not plan:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        ordering = ()
+        if hasattr(self.paginator, 'get_ordering'):
+            ordering = self.paginator.get_ordering(request, queryset, self)
+        rows = plan.values(
+            queryset, extra=[term.lstrip('-') for term in ordering])
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(plan.represent(page))
+        return Response(plan.represent(list(rows)))
@@ -1,46 +1,156 @@
-from rest_framework import viewsets, mixins, status
-from rest_framework.authentication import TokenAuthentication
+from django.db import transaction
+from django.db.models import Prefetch
+from rest_framework import viewsets, mixins, status, filters
 from rest_framework.permissions import IsAuthenticated
 from core.models import Tag, Ingredient, Recipe
+from core.storage import content_storage
+from core.search import update_search_vectors
 from recipe import serializers
+from recipe.async_views import AsyncViewSetMixin
+from recipe.bulk import BulkMixin, insert, resolve_ids, set_relations
+from recipe.cache import CachedListMixin
+from recipe.filters import (
+    AssignedOnlyFilter, RecipeCountFilter, RecipeRelationFilter,
+    RecipeSearchFilter, query_flag)
+from recipe.images import lock_image, schedule_processing
+from recipe.pagination import NameCursorPagination, RecipeCursorPagination
+from recipe.uploads import RecipeImageUploadHandler, StoredUpload
+from recipe.values import ValuesListMixin
+from user.authentication import CachedTokenAuthentication
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 
 
-class BaseViewSet(viewsets.GenericViewSet, mixins.ListModelMixin, mixins.CreateModelMixin):
+class BaseViewSet(AsyncViewSetMixin, BulkMixin, CachedListMixin,
+                  ValuesListMixin, viewsets.GenericViewSet,
+                  mixins.ListModelMixin, mixins.CreateModelMixin):
     """Acts as base class for ingredients and tags"""
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = NameCursorPagination
+    filter_backends = (AssignedOnlyFilter, RecipeCountFilter)
 
     def get_queryset(self):
         return self.queryset.filter(user=self.request.user).order_by('-name')
 
+    def get_serializer_class(self):
+        if self.action == 'list' and query_flag(self.request, 'with_counts'):
+            return self.count_serializer_class
+        return super().get_serializer_class()
+
     def perform_create(self, serializer):
         """Create new tag"""
         serializer.save(user=self.request.user)
 
+    def bulk_write(self, validated_data, instances):
+        """Writes the objects and refreshes the recipes using renamed ones"""
+        objs = super().bulk_write(validated_data, instances)
+        if instances is not None:
+            used = Recipe.objects.filter(**{f'{self.recipe_field}__in': objs})
+            update_search_vectors(
+                Recipe.objects.filter(pk__in=used.values('pk')))
+        return objs
+
 
 class TagViewSet(BaseViewSet):
     """Manages the tag in the database"""
     queryset = Tag.objects.all()
     serializer_class = serializers.TagSerializer
+    count_serializer_class = serializers.TagCountSerializer
+    recipe_field = 'tags'
 
 
 class IngredientViewSet(BaseViewSet):
     """Manages the Ingredients in the database"""
     queryset = Ingredient.objects.all()
     serializer_class = serializers.IngredientSerializer
+    count_serializer_class = serializers.IngredientCountSerializer
+    recipe_field = 'ingredients'
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(AsyncViewSetMixin, BulkMixin, CachedListMixin,
+                    ValuesListMixin, viewsets.ModelViewSet):
     """Manages Recipe in Datasets"""
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
     serializer_class = serializers.RecipeSerializer
     queryset = Recipe.objects.all()
+    pagination_class = RecipeCursorPagination
+    filter_backends = (
+        RecipeRelationFilter, RecipeSearchFilter, filters.OrderingFilter)
+    ordering_fields = ('id', 'title')
+    ordering = ('id',)
 
     def get_queryset(self):
-        return self.queryset.filter(user=self.request.user)
+        """Returns the user's recipes with the prefetches the action needs"""
+        queryset = self.queryset.filter(
+            user=self.request.user).defer('search_vector')
+        if self.action in ('list', 'retrieve'):
+            return self.sparse_queryset(queryset)
+        return queryset
+
+    def sparse_fieldset(self):
+        """Returns the ?fields= and ?expand= requested, None when absent"""
+        requested = []
+        for param, allowed in (
+                ('fields', serializers.RecipeSerializer.Meta.fields),
+                ('expand', serializers.RecipeSerializer.expandable)):
+            value = self.request.query_params.get(param)
+            if value is None:
+                requested.append(None)
+                continue
+            names = {name for name in value.split(',') if name}
+            unknown = names.difference(allowed)
+            if unknown:
+                raise ValidationError({param: 'Unknown fields {}, expected '
+                                       'some of {}.'.format(
+                                           ', '.join(sorted(unknown)),
+                                           ', '.join(allowed))})
+            requested.append(names)
+        return tuple(requested)
+
+    def sparse_queryset(self, queryset):
+        """Loads only the columns and relations the response will show"""
+        fields, expand = self.sparse_fieldset()
+        if expand is None:
+            expand = self.get_serializer_class().default_expand
+        if fields is None:
+            fields = serializers.RecipeSerializer.Meta.fields
+        else:
+            ordering = filters.OrderingFilter().get_ordering(
+                self.request, queryset, self) or ()
+            queryset = queryset.only(
+                'id', *(name for name in fields
+                        if name not in ('tags', 'ingredients')),
+                *(term.lstrip('-') for term in ordering))
+
+        for field, model in (('tags', Tag), ('ingredients', Ingredient)):
+            if field in fields:
+                columns = ('id', 'name') if field in expand else ('id',)
+                related = model.objects.only(*columns).order_by('id')
+                queryset = queryset.prefetch_related(
+                    Prefetch(field, queryset=related))
+        return queryset
+
+    def with_relation_ids(self, queryset):
+        """Prefetches the ids of the tags and ingredients of the recipes"""
+        return queryset.prefetch_related(
+            Prefetch('tags', queryset=Tag.objects.only('id').order_by('id')),
+            Prefetch('ingredients',
+                     queryset=Ingredient.objects.only('id').order_by('id')),
+        )
+
+    def get_serializer_context(self):
+        """Passes the requested sparse fieldset to the serializer"""
+        context = super().get_serializer_context()
+        if self.action in ('list', 'retrieve'):
+            fields, expand = self.sparse_fieldset()
+            if fields is not None:
+                context['fields'] = fields
+            if expand is not None:
+                context['expand'] = expand
+        return context
 
     def get_serializer_class(self):
         """Returns appopriate serializer class"""
@@ -48,24 +158,92 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return serializers.RecipeDetailSerializer
         elif self.action == 'upload_image':
             return serializers.RecipeImageSerializer
+        elif self.action == 'bulk':
+            return serializers.RecipeBulkSerializer
         return self.serializer_class
 
     def perform_create(self, serializer):
         """Create new recipe"""
         serializer.save(user=self.request.user)
 
+    def check_bulk_items(self, validated_data, errors):
+        """Resolves the tags and ingredients of all the items at once"""
+        for field, model in (('tags', Tag), ('ingredients', Ingredient)):
+            requested = set().union(
+                *(data.get(field, ()) for data in validated_data))
+            owned = resolve_ids(model, self.request.user, requested)
+            for data, item_errors in zip(validated_data, errors):
+                missing = [pk for pk in data.get(field, ()) if pk not in owned]
+                if missing:
+                    item_errors[field] = [
+                        f'Invalid pk "{pk}" - object does not exist.'
+                        for pk in missing]
+
+    def bulk_write(self, validated_data, instances):
+        """Writes the recipes and their through rows in bulk"""
+        relations = ('tags', 'ingredients')
+        if instances is None:
+            recipes = insert(Recipe, [
+                Recipe(user=self.request.user, **{
+                    name: value for name, value in data.items()
+                    if name not in relations})
+                for data in validated_data])
+        else:
+            recipes, fields = instances, set()
+            for recipe, data in zip(recipes, validated_data):
+                for name, value in data.items():
+                    if name not in relations:
+                        setattr(recipe, name, value)
+                        fields.add(name)
+            if fields:
+                Recipe.objects.bulk_update(recipes, fields)
+
+        for field in relations:
+            wanted = {recipe.pk: set(data[field])
+                      for recipe, data in zip(recipes, validated_data)
+                      if field in data}
+            if wanted:
+                set_relations(field, wanted, created=instances is None)
+        update_search_vectors(
+            Recipe.objects.filter(pk__in=[recipe.pk for recipe in recipes]))
+        return recipes
+
+    def bulk_representation(self, recipes):
+        recipes = self.with_relation_ids(
+            Recipe.objects.filter(pk__in=[recipe.pk for recipe in recipes])
+            .defer('search_vector').order_by('id'))
+        return serializers.RecipeSerializer(recipes, many=True).data
+
     @action(methods=['POST','GET'], detail=True, url_path='upload-image')
     def upload_image(self, request, pk=None):
-        """Uploades a image"""
+        """Uploades a image and queues its renditions"""
         recipe = self.get_object()
-        serializer = self.get_serializer(recipe, data=request.data)
-        if serializer.is_valid():
-            serializer.save()
+        if request.method == 'GET':
+            return Response(self.get_serializer(recipe).data)
+        handler = RecipeImageUploadHandler(recipe, request)
+        request._request.upload_handlers = [handler]
+        upload = request.data.get('image')
+        if handler.error:
+            return Response(
+                {'image': [str(handler.error)]},
+                status=handler.error.status_code
+            )
+        if not isinstance(upload, StoredUpload):
             return Response(
-                serializer.data,
-                status=status.HTTP_200_OK
+                {'image': ['No file was submitted.']},
+                status=status.HTTP_400_BAD_REQUEST
             )
+
+        with transaction.atomic():
+            lock_image(upload.name)
+            content_storage.move_into_place(upload.temp_name, upload.name)
+            recipe.image = upload.name
+            recipe.image_status = Recipe.IMAGE_PENDING
+            recipe.image_renditions = {}
+            recipe.save(
+                update_fields=['image', 'image_status', 'image_renditions'])
+            schedule_processing(recipe)
         return Response(
-            serializer.errors,
-            status=status.HTTP_400_BAD_REQUEST
+            self.get_serializer(recipe).data,
+            status=status.HTTP_202_ACCEPTED
         )
@@ -0,0 +1,132 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+
+class TokenCache:
+    """Bounded LRU of authenticated tokens with a time to live"""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def discard(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+token_cache = TokenCache(
+    settings.TOKEN_AUTH_CACHE['MAX_SIZE'], settings.TOKEN_AUTH_CACHE['TTL'])
+
+
+def shared_cache():
+    """Returns the cache shared between workers, if one is configured"""
+    alias = settings.TOKEN_AUTH_CACHE['SHARED_CACHE_ALIAS']
+    return caches[alias] if alias else None
+
+
+def shared_key(key):
+    return f'auth:token:{key}'
+
+
+def invalidate_token(key):
+    """Forgets a token in this process and in the shared cache"""
+    token_cache.discard(key)
+    shared = shared_cache()
+    if shared is not None:
+        shared.delete(shared_key(key))
+
+
+def invalidate_token_on_commit(key):
+    """Forgets a token once the current transaction commits
+
+    Forgetting it earlier would let a concurrent request cache the token
+    and user rows it still sees, until the entry expires.
+    """
+    transaction.on_commit(lambda: invalidate_token(key))
+
+
+def token_expires(token):
+    """Returns when the token expires unless it is used before"""
+    return token.created + settings.TOKEN_TTL
+
+
+def token_for(user):
+    """Returns the token of the user, replacing it once it has expired"""
+    token, created = Token.objects.get_or_create(user=user)
+    if not created and token_expires(token) <= timezone.now():
+        token.delete()
+        token = Token.objects.create(user=user)
+    return token
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Token authentication remembering the token and user lookups
+
+    Entries live in a per process LRU for TOKEN_AUTH_CACHE['TTL']
+    seconds and optionally in a shared cache. Deleting a token or saving
+    its user drops the entry once the write commits; without a shared
+    cache the other processes keep accepting it until the TTL expires.
+
+    Tokens expire TOKEN_TTL after they were created or last refreshed.
+    Using a token older than TOKEN_REFRESH_INTERVAL moves its creation
+    time forward, so active clients keep their token with at most one
+    write per interval.
+    """
+
+    def authenticate_credentials(self, key):
+        entry = token_cache.get(key)
+        if entry is None:
+            shared = shared_cache()
+            if shared is not None:
+                entry = shared.get(shared_key(key))
+            if entry is None:
+                entry = super().authenticate_credentials(key)
+                if shared is not None:
+                    shared.set(shared_key(key), entry,
+                               settings.TOKEN_AUTH_CACHE['TTL'])
+            token_cache.set(key, entry)
+
+        user, token = entry
+        now = timezone.now()
+        if token_expires(token) <= now:
+            invalidate_token(key)
+            raise exceptions.AuthenticationFailed(_('Token has expired.'))
+        if now - token.created >= settings.TOKEN_REFRESH_INTERVAL:
+            Token.objects.filter(key=key).update(created=now)
+            token.created = now
+        return copy.copy(user), token
@@ -1,9 +1,10 @@
 from django.contrib.auth import authenticate, get_user_model
 from rest_framework import serializers
 from django.utils.translation import ugettext_lazy as _
+from core.metrics import TimedSerializerMixin
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """User Serializers"""
     class Meta:
         model = get_user_model()
@@ -0,0 +1,113 @@
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from user.authentication import token_cache
+
+ME_URL = reverse('user:me')
+
+
+class CachedTokenAuthenticationTest(TestCase):
+    """Test the cached token authentication"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            email='helo@world.com', password='testpass', name='heloworld!')
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        token_cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def get_me(self):
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(ME_URL)
+        token_queries = [query for query in queries.captured_queries
+                         if 'authtoken_token' in query['sql']]
+        return res, len(token_queries)
+
+    def test_token_lookup_is_cached(self):
+        """Test only the first request looks up the token"""
+        res, first = self.get_me()
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(first, 1)
+
+        res, second = self.get_me()
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email)
+        self.assertEqual(second, 0)
+
+    def test_deleted_token_rejected(self):
+        """Test a deleted token is no longer accepted"""
+        self.get_me()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.token.delete()
+        res, _ = self.get_me()
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_inactive_user_rejected(self):
+        """Test deactivating a user drops its cached token"""
+        self.get_me()
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        res, _ = self.get_me()
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change_reloads_user(self):
+        """Test changing the password refreshes the cached user"""
+        self.get_me()
+        self.user.set_password('newpass')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        res, queries = self.get_me()
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(queries, 1)
+
+    def test_user_kept_cached_until_commit(self):
+        """Test a deactivation is only seen once it commits"""
+        self.get_me()
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.user.save()
+            res, _ = self.get_me()
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+        for callback in callbacks:
+            callback()
+        res, _ = self.get_me()
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def age_token(self, **delta):
+        Token.objects.filter(key=self.token.key).update(
+            created=timezone.now() - timedelta(**delta))
+
+    def test_expired_token_rejected(self):
+        """Test a token past its time to live is refused"""
+        self.age_token(days=15)
+        res, _ = self.get_me()
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_used_token_is_refreshed(self):
+        """Test using a token older than the refresh interval extends it"""
+        self.age_token(days=13)
+        res, _ = self.get_me()
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.token.refresh_from_db()
+        self.assertLess(timezone.now() - self.token.created,
+                        timedelta(minutes=1))
+
+    def test_recent_token_not_written(self):
+        """Test a recently refreshed token is not updated again"""
+        self.age_token(hours=1)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(ME_URL)
+        self.assertFalse([query for query in queries.captured_queries
+                          if query['sql'].startswith('UPDATE')])
@@ -1,8 +1,15 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest.mock import patch
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
 from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
 from rest_framework.test import APIClient
 from rest_framework import status
+from user.throttling import LoginEmailRateThrottle
 
 
 CREATE_USER_URL = reverse('user:create')
@@ -56,6 +63,23 @@ class PublicUserApiTest(TestCase):
         self.assertIn('token', res.data)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
 
+    def test_expired_token_rotated_on_login(self):
+        """Test logging in replaces an expired token with a new one"""
+        payload = {'email': 'helo@world.com', 'password': 'testpass', }
+        user = create_user(**payload)
+        expired = Token.objects.create(user=user)
+        Token.objects.filter(key=expired.key).update(
+            created=timezone.now() - timedelta(days=30))
+
+        res = self.client.post(TOKEN_URL, payload)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res.data['token'], expired.key)
+        self.assertIn('expires', res.data)
+        self.assertFalse(Token.objects.filter(key=expired.key).exists())
+
+        res_again = self.client.post(TOKEN_URL, payload)
+        self.assertEqual(res_again.data['token'], res.data['token'])
+
     def test_create_token_invalid(self):
         """Test token for invalid credentials"""
         payload = {'email': 'helo@world.com', 'password': 'wrongpass'}
@@ -78,6 +102,43 @@ class PublicUserApiTest(TestCase):
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertNotIn('token', res.data)
 
+    @override_settings(PASSWORD_HASHERS=[
+        'core.hashers.TunedArgon2PasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    ])
+    def test_login_rehashes_legacy_password(self):
+        """Test a password hashed by a legacy hasher is upgraded on login"""
+        user = create_user(email='helo@world.com', password='testpass')
+        user.password = make_password(
+            'testpass', hasher='pbkdf2_sha256')
+        user.save()
+        res = self.client.post(
+            TOKEN_URL, {'email': 'helo@world.com', 'password': 'testpass'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('argon2'))
+
+    @patch.object(LoginEmailRateThrottle, 'THROTTLE_RATES',
+                  {'login_email': '2/min'})
+    def test_login_attempts_throttled_before_hashing(self):
+        """Test repeated logins for an email are refused without hashing"""
+        cache.clear()
+        payload = {'email': 'helo@world.com', 'password': 'wrongpass'}
+        create_user(email='helo@world.com', password='testpass')
+        with patch('user.serializers.authenticate',
+                   return_value=None) as authenticate:
+            for _ in range(3):
+                res = self.client.post(TOKEN_URL, payload)
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(authenticate.call_count, 2)
+
+    def test_login_body_not_an_object(self):
+        """Test a JSON body that is not an object is a validation error"""
+        for body in ([], 'abc'):
+            res = self.client.post(TOKEN_URL, body, format='json')
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertNotIn('token', res.data)
+
     def test_retrieve_user_unauthorized(self):
         """Tests user can not be retirived without authorization"""
         res = self.client.get(ME_URL)
@@ -87,12 +148,14 @@ class PublicUserApiTest(TestCase):
 class PrivateUserApiTest(TestCase):
     """Test apis that requires authentication"""
 
-    def setUp(self):
-        self.user = create_user(
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(
             email="helo@world", 
             name="heloworld!", 
             password="testpass")
-        
+
+    def setUp(self):
         self.client = APIClient()
         self.client.force_authenticate(self.user)
     
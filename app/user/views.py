@@ -1,7 +1,11 @@
 from user.serializers import UserSerializer,AuthTokenSerialzer
-from rest_framework import generics,authentication,permissions
+from rest_framework import generics,permissions
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
+from user.authentication import (
+    CachedTokenAuthentication, token_expires, token_for)
+from user.throttling import LoginEmailRateThrottle, LoginIPRateThrottle
 
 
 
@@ -13,11 +17,19 @@ class CreateTokenView(ObtainAuthToken):
     """Generates Token for the user"""
     serializer_class = AuthTokenSerialzer
     renderer_classes= api_settings.DEFAULT_RENDERER_CLASSES
+    throttle_classes = (LoginIPRateThrottle, LoginEmailRateThrottle)
+
+    def post(self, request, *args, **kwargs):
+        """Returns the token of the user, rotated once it has expired"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        token = token_for(serializer.validated_data['user'])
+        return Response({'token': token.key, 'expires': token_expires(token)})
 
 class ManageUserView(generics.RetrieveUpdateAPIView):
     """Manage the authenticated user"""
     serializer_class = UserSerializer
-    authentication_classes = (authentication.TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
 
     def get_object(self):
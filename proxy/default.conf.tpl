@@ -0,0 +1,26 @@
+server {
+    listen ${LISTEN_PORT};
+
+    location /static/ {
+        alias /vol/web/static/;
+        expires 30d;
+        access_log off;
+    }
+
+    # Recipe images are stored under their content hash, so a name
+    # always serves the same bytes.
+    location /media/ {
+        alias /vol/web/media/;
+        expires 30d;
+        add_header Cache-Control "public, immutable";
+    }
+
+    location / {
+        proxy_pass http://${APP_HOST}:${APP_PORT};
+        proxy_set_header Host $host;
+        proxy_set_header X-Forwarded-For $proxy_add_x_forwarded_for;
+        proxy_set_header X-Forwarded-Proto $scheme;
+        proxy_redirect off;
+        client_max_body_size 11m;
+    }
+}